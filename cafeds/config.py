@@ -3,9 +3,30 @@ import os
 # ---- Networking ----
 DISCOVERY_PORT = int(os.environ.get("CAFEDS_DISCOVERY_PORT", "37020"))
 NODE_UDP_BASE = int(os.environ.get("CAFEDS_NODE_UDP_BASE", "37100"))
+# Discovery and data traffic use separate sockets:
+#   - DISCOVERY_PORT (leader only) receives WHO_IS_LEADER broadcasts and
+#     answers unicast, so it doesn't enable SO_BROADCAST
+#   - NODE_UDP_BASE + node_id carries heartbeats, elections and ID checks
+DISCOVERY_LISTEN_ADDR = ""
+# Identical datagrams from the same sender within this window are dropped
+# (a broadcast arrives once per matching discovery target / interface)
+DUPLICATE_WINDOW = 0.1
+# Multicast discovery (CAFEDS_DISCOVERY_MULTICAST=1): WHO_IS_LEADER and ID
+# checks go to one group address instead of every broadcast address.
+# Off by default: many campus/hotspot WiFi networks filter multicast, and
+# the broadcast targets keep working there.
+DISCOVERY_MULTICAST = os.environ.get(
+    "CAFEDS_DISCOVERY_MULTICAST", ""
+).strip().lower() in {"1", "true", "yes"}
+DISCOVERY_MCAST_GROUP = "239.10.10.10"
+DISCOVERY_MCAST_TTL = 1  # stay on the local subnet
+# DISCOVERY_TARGETS is resolved lazily from cafeds.net (see __getattr__ below)
 
 # ---- Timings ----
 DISCOVERY_INTERVAL = 1.0
+# WHO_IS_LEADER broadcasts back off exponentially while the peer set is stable
+DISCOVERY_INTERVAL_MIN = DISCOVERY_INTERVAL
+DISCOVERY_INTERVAL_MAX = 10.0
 HEARTBEAT_INTERVAL = 1.0
 LEADER_TIMEOUT = 3.5
 
@@ -18,13 +39,46 @@ LOG_PREFIX = "[CafeDS]"
 # ---- WAL (Write-Ahead Log) Persistence ----
 # Enable/disable WAL (set to False to disable disk persistence)
 WAL_ENABLED = True
+# On-disk record format:
+#   "jsonl"  - one JSON object per line (human-readable)
+#   "binary" - length-prefixed JSON + CRC32 (torn/corrupt tail records are detected)
+WAL_FORMAT = "jsonl"
+# Group commit: after the first pending append, wait this long (seconds) so a
+# burst of orders shares one write + fdatasync
+WAL_SYNC_INTERVAL = 0.001
+# How a batch is made durable:
+#   "fdatasync" - write, then one fdatasync per batch (best for small, bursty orders)
+#   "dsync"     - open the WAL with O_DSYNC; each write is durable on return
+WAL_SYNC_MODE = "fdatasync"
+# Replay the WAL through a read-only mmap on startup (no copy into Python memory)
+WAL_USE_MMAP = True
 # WAL file path pattern ({node_id} will be replaced with actual node ID)
-WAL_FILE = "cafeds_wal_node_{node_id}.jsonl"
+WAL_FILE = (
+    "cafeds_wal_node_{node_id}.jsonl"
+    if WAL_FORMAT == "jsonl"
+    else "cafeds_wal_node_{node_id}.wal"
+)
 
 # ---- Omission Fault Tolerance ----
-# Number of times to send each heartbeat (reduces false elections from packet loss)
-HEARTBEAT_REDUNDANCY = 2
+# Heartbeats carry a sequence number; a follower that misses one sends a
+# HEARTBEAT_NACK and the leader re-sends its latest heartbeat to that follower
+# (instead of sending every heartbeat twice).
+HEARTBEAT_SEQ = True
+
+# ---- Order deduplication ----
+# How many recent order UUIDs the leader remembers to drop client re-sends
+ORDER_UUID_MEMORY = 100_000
 
 # ---- Peer expiry ----
 # How long (seconds) before an unseen peer is removed from the registry
 PEER_EXPIRY = 5.0
+
+
+def __getattr__(name: str):
+    # PEP 562: keep importing config free of socket probes; discovery targets
+    # have a single source of truth in cafeds.net.
+    if name == "DISCOVERY_TARGETS":
+        from .net import discovery_targets
+
+        return discovery_targets()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
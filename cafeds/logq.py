@@ -0,0 +1,75 @@
+import queue
+import sys
+import threading
+import time
+
+from .config import LOG_PREFIX
+
+# Log lines are printed by one background thread so that callers (often
+# holding delivery/history/peers locks) never block on a slow terminal or pipe.
+# Only diagnostic lines may be dropped; kept lines (DELIVER) wait for room.
+LOG_QUEUE_SIZE = 10_000
+
+_queue: "queue.Queue[str]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_dropped = 0
+_dropped_lock = threading.Lock()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def log_line(line: str, keep: bool = False) -> None:
+    """
+    Queue one line for stdout.
+
+    When the queue is full a diagnostic line is dropped (and counted); a
+    `keep` line blocks until the writer makes room, so it is never lost.
+    """
+    global _dropped
+    if _writer is None:
+        _start_writer()
+    if keep:
+        _queue.put(line)
+        return
+    try:
+        _queue.put_nowait(line)
+    except queue.Full:
+        with _dropped_lock:
+            _dropped += 1
+
+
+def flush(timeout: float = 1.0) -> None:
+    """Wait (bounded) until every queued line has been written."""
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _start_writer() -> None:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_drain, name="cafeds-log", daemon=True)
+            _writer.start()
+
+
+def _drain() -> None:
+    global _dropped
+    while True:
+        lines = [_queue.get()]
+        while True:
+            try:
+                lines.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        taken = len(lines)
+        with _dropped_lock:
+            dropped, _dropped = _dropped, 0
+        if dropped:
+            lines.append(f"{LOG_PREFIX} {dropped} log lines dropped (output too slow)")
+        try:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+        except Exception:
+            pass  # closed/broken stdout must not kill the writer
+        for _ in range(taken):
+            _queue.task_done()
@@ -1,28 +1,127 @@
+import functools
+import heapq
+import itertools
 import os
+import selectors
 import socket
-from typing import List
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
+from .config import DISCOVERY_MCAST_GROUP, DISCOVERY_MULTICAST
+from .udp_bus import send_many
 
-def primary_ip() -> str:
+# How long (seconds) a resolved primary IP is reused before re-probing the route
+PRIMARY_IP_TTL = 30.0
+
+_PRIMARY_IP_CACHE = {"ip": None, "ts": 0.0}
+
+# Probe sockets never block and are never inherited; on Linux both flags are
+# applied atomically by socket() itself (0 on platforms without them).
+_PROBE_SOCK_TYPE = (
+    socket.SOCK_DGRAM
+    | getattr(socket, "SOCK_CLOEXEC", 0)
+    | getattr(socket, "SOCK_NONBLOCK", 0)
+)
+
+# ---- IPv4 address classification ----
+LOOPBACK = 1 << 0  # 127.0.0.0/8
+UNSPECIFIED = 1 << 1  # 0.0.0.0/8
+
+_IPV4_CLASSES = (
+    (0x7F000000, 0xFF000000, LOOPBACK),
+    (0x00000000, 0xFF000000, UNSPECIFIED),
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _classify(ip: str) -> int:
+    """Bitmask of the address classes above; 0 for unparsable input."""
+    try:
+        (n,) = struct.unpack("!I", socket.inet_aton(ip))
+    except (OSError, TypeError):
+        return 0
+    flags = 0
+    for net, mask, flag in _IPV4_CLASSES:
+        if n & mask == net:
+            flags |= flag
+    return flags
+
+
+def is_loopback(ip: str) -> bool:
+    return bool(_classify(ip) & LOOPBACK)
+
+
+def is_unspecified(ip: str) -> bool:
+    return bool(_classify(ip) & UNSPECIFIED)
+
+
+def _route_source_ip(dest_ip: str, port: int) -> str:
     """
-    Best-effort: finds the IP of the default route interface.
-    Works on Windows/Linux without external libs.
+    Local IP the kernel would use to reach dest_ip (no packet is sent).
+
+    Uses a fresh socket per probe on purpose: once a UDP socket is connected,
+    Linux pins its source address, so a long-lived shared probe socket would
+    keep answering with the old route after an interface change. Callers
+    cache the result instead (see primary_ip / local_ip_for_peer).
     """
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s = socket.socket(socket.AF_INET, _PROBE_SOCK_TYPE)
     try:
         # connect() on UDP does not send packets, it just picks the route
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-        if ip and not ip.startswith("127."):
-            return ip
-    except Exception:
-        pass
+        s.connect((dest_ip, port))
+        return s.getsockname()[0]
     finally:
         try:
             s.close()
         except Exception:
             pass
-    return "127.0.0.1"
+
+
+def primary_ip() -> str:
+    """
+    Best-effort: finds the IP of the default route interface.
+    Works on Windows/Linux without external libs.
+
+    The result is cached for PRIMARY_IP_TTL seconds so the discovery/heartbeat
+    loops don't open a probe socket on every tick.
+    """
+    cached = _PRIMARY_IP_CACHE["ip"]
+    if cached and (time.monotonic() - _PRIMARY_IP_CACHE["ts"]) < PRIMARY_IP_TTL:
+        return cached
+
+    ip = "127.0.0.1"
+    try:
+        found = _route_source_ip("8.8.8.8", 80)
+        if found and not is_loopback(found):
+            ip = found
+    except OSError:
+        # interface change / no route: don't keep a stale answer around
+        _PRIMARY_IP_CACHE["ip"] = None
+        _PRIMARY_IP_CACHE["ts"] = 0.0
+        return ip
+
+    _PRIMARY_IP_CACHE["ip"] = ip
+    _PRIMARY_IP_CACHE["ts"] = time.monotonic()
+    return ip
+
+
+@functools.lru_cache(maxsize=256)
+def _local_ip_for_subnet(subnet24: str) -> str:
+    """Source IP for a /24 (routes rarely differ inside one), probed once."""
+    probe = subnet24 + ".1" if subnet24.count(".") == 2 else subnet24
+    ip = _route_source_ip(probe, 9)
+    if not ip or is_unspecified(ip):
+        # raising keeps lru_cache from remembering a useless answer
+        raise OSError(f"no usable source address for {subnet24}")
+    return ip
+
+
+def clear_route_cache() -> None:
+    """Forget cached source addresses (call after a network/interface change)."""
+    _local_ip_for_subnet.cache_clear()
+    _PRIMARY_IP_CACHE["ts"] = 0.0
 
 
 def local_ip_for_peer(peer_ip: str) -> str:
@@ -30,67 +129,302 @@ def local_ip_for_peer(peer_ip: str) -> str:
     Returns the local interface IP that would be used to reach peer_ip.
     Very helpful if machine has multiple NICs.
     """
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    parts = peer_ip.split(".")
+    key = ".".join(parts[:3]) if len(parts) == 4 else peer_ip
     try:
-        s.connect((peer_ip, 9))
-        ip = s.getsockname()[0]
-        if ip:
-            return ip
+        return _local_ip_for_subnet(key)
+    except OSError:
+        # lru_cache does not store exceptions; drop everything in case routes changed
+        _local_ip_for_subnet.cache_clear()
     except Exception:
         pass
-    finally:
-        try:
-            s.close()
-        except Exception:
-            pass
     return primary_ip()
 
 
 def guess_directed_broadcast(ip: str) -> str:
     # simple /24 heuristic (enough for most campus/home LANs)
     parts = ip.split(".")
-    if len(parts) == 4 and not ip.startswith("127."):
+    if len(parts) == 4 and not is_loopback(ip):
         return ".".join(parts[:3] + ["255"])
     return "255.255.255.255"
 
 
-def _is_single_pc_mode() -> bool:
-    """Check if CAFEDS_SINGLE_PC env var is set."""
-    return os.environ.get("CAFEDS_SINGLE_PC", "").strip().lower() in (
-        "1",
-        "true",
-        "yes",
-    )
+def _linux_ipv4_interfaces() -> List[Tuple[str, str]]:
+    """Return (ip, netmask) for every IPv4-configured interface (Linux only)."""
+    import fcntl
+
+    SIOCGIFADDR = 0x8915
+    SIOCGIFNETMASK = 0x891B
+
+    out: List[Tuple[str, str]] = []
+    s = socket.socket(socket.AF_INET, _PROBE_SOCK_TYPE)
+    try:
+        for _, name in socket.if_nameindex():
+            ifreq = struct.pack("256s", name.encode()[:15])
+            try:
+                addr = fcntl.ioctl(s.fileno(), SIOCGIFADDR, ifreq)[20:24]
+                mask = fcntl.ioctl(s.fileno(), SIOCGIFNETMASK, ifreq)[20:24]
+            except OSError:
+                continue  # interface has no IPv4 address
+            out.append((socket.inet_ntoa(addr), socket.inet_ntoa(mask)))
+    finally:
+        s.close()
+    return out
 
 
-def discovery_targets() -> List[str]:
+def all_directed_broadcasts() -> List[str]:
+    """
+    Directed broadcast address (ip | ~netmask) of every connected IPv4 NIC,
+    so multi-homed hosts (VPN, secondary LAN) are discovered in one round.
+
+    Falls back to the /24 guess for the default route on platforms where
+    interfaces can't be enumerated without external libs.
+    """
+    out: List[str] = []
+    try:
+        ifaces = _linux_ipv4_interfaces() if sys.platform.startswith("linux") else []
+    except Exception:
+        ifaces = []
+    for ip, netmask in ifaces:
+        if is_loopback(ip):
+            continue
+        (ip_n,) = struct.unpack("!I", socket.inet_aton(ip))
+        (mask_n,) = struct.unpack("!I", socket.inet_aton(netmask))
+        if mask_n == 0xFFFFFFFF:
+            continue  # point-to-point /32 has no broadcast address
+        bcast = (ip_n & mask_n) | (~mask_n & 0xFFFFFFFF)
+        out.append(socket.inet_ntoa(struct.pack("!I", bcast)))
+
+    if not out:
+        ip = primary_ip()
+        if not is_loopback(ip):
+            out.append(guess_directed_broadcast(ip))
+    return out
+
+
+# CAFEDS_SINGLE_PC is read once at import (set it before importing cafeds)
+_SINGLE_PC = os.environ.get("CAFEDS_SINGLE_PC", "").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+}
+
+
+def _build_discovery_targets() -> List[str]:
     """
     Build the list of IPs to send discovery / heartbeat broadcasts to.
 
     Multi-PC (default):
-      - LAN /24 broadcast + global broadcast
+      - directed broadcast of each LAN interface + global broadcast
       - 127.0.0.1 is EXCLUDED (prevents 'leader=127.0.0.1' self-connect bugs)
 
+    Multicast (CAFEDS_DISCOVERY_MULTICAST=1):
+      - the single DISCOVERY_MCAST_GROUP replaces the broadcast addresses
+
     Single-PC test (CAFEDS_SINGLE_PC=1):
       - Adds 127.0.0.1 so that nodes on the same machine can find each other
     """
-    ip = primary_ip()
     targets: List[str] = []
 
-    # LAN /24 broadcast if we have a real LAN IP
-    if not ip.startswith("127."):
-        targets.append(guess_directed_broadcast(ip))
+    if DISCOVERY_MULTICAST:
+        targets.append(DISCOVERY_MCAST_GROUP)
+    else:
+        # directed broadcast on every connected LAN interface
+        targets.extend(all_directed_broadcasts())
 
-    # global broadcast
-    targets.append("255.255.255.255")
+        # global broadcast
+        targets.append("255.255.255.255")
 
     # single-PC mode: add localhost so 3-terminal demo works
-    if _is_single_pc_mode():
+    if _SINGLE_PC:
         targets.append("127.0.0.1")
 
     # deduplicate, preserve order
-    out: List[str] = []
-    for x in targets:
-        if x not in out:
-            out.append(x)
-    return out
+    return list(dict.fromkeys(targets))
+
+
+_DISCOVERY_TARGETS_CACHE: Tuple[str, ...] = tuple(_build_discovery_targets())
+
+
+def discovery_targets() -> Tuple[str, ...]:
+    """
+    Return the discovery / heartbeat broadcast targets.
+
+    Computed once at import; call refresh_discovery_targets() after an
+    interface change (e.g. when sendto() starts failing).
+    """
+    return _DISCOVERY_TARGETS_CACHE
+
+
+def refresh_discovery_targets() -> Tuple[str, ...]:
+    """Re-probe the network and replace the cached discovery targets."""
+    global _DISCOVERY_TARGETS_CACHE
+    clear_route_cache()
+    _DISCOVERY_TARGETS_CACHE = tuple(_build_discovery_targets())
+    _RESOLVED_TARGETS_CACHE.clear()
+    _BROADCASTERS.clear()
+    return _DISCOVERY_TARGETS_CACHE
+
+
+def _is_literal_ipv4(host: str) -> bool:
+    try:
+        socket.inet_pton(socket.AF_INET, host)
+        return True
+    except (OSError, TypeError):
+        return False
+
+
+_RESOLVED_TARGETS_CACHE: Dict[int, Tuple[Tuple[int, Tuple[str, int]], ...]] = {}
+
+
+def resolved_targets(port: int) -> Tuple[Tuple[int, Tuple[str, int]], ...]:
+    """
+    Discovery targets as ready-to-use (family, sockaddr) pairs for `port`.
+
+    Only literal IPv4 targets are kept, so sendto() never needs a name lookup.
+    Cached per port until refresh_discovery_targets().
+    """
+    cached = _RESOLVED_TARGETS_CACHE.get(port)
+    if cached is None:
+        cached = tuple(
+            (socket.AF_INET, (t, port))
+            for t in discovery_targets()
+            if _is_literal_ipv4(t)
+        )
+        _RESOLVED_TARGETS_CACHE[port] = cached
+    return cached
+
+
+_BROADCASTERS: Dict[int, Callable[[socket.socket, bytes], int]] = {}
+
+
+def _make_broadcaster(port: int) -> Callable[[socket.socket, bytes], int]:
+    # Bind the destination tuple into the closure once; the per-send path is
+    # then a single call with no lookups or list building.
+    addrs = tuple(addr for _, addr in resolved_targets(port))
+
+    def _send_all(sock: socket.socket, payload: bytes) -> int:
+        return send_many(sock, payload, addrs)
+
+    return _send_all
+
+
+def broadcast_all(sock: socket.socket, payload: bytes, port: int) -> int:
+    """
+    Send payload to every discovery target on `port` in one pass
+    (a single sendmmsg() syscall on Linux). Returns the number of failed targets.
+    """
+    send_all = _BROADCASTERS.get(port)
+    if send_all is None:
+        send_all = _BROADCASTERS[port] = _make_broadcaster(port)
+    return send_all(sock, payload)
+
+
+class EventLoop:
+    """
+    Single-thread readiness loop (epoll on Linux) for the node's sockets.
+
+    Each registered socket gets a callback(sock) that is invoked when it is
+    readable (a datagram, a connection or stream bytes are waiting), so one
+    thread serves every listener. set_writer() adds a second callback for
+    when a stream socket can take more data. Periodic work
+    that never blocks (e.g. leader heartbeats) can run on the same thread
+    via call_every().
+
+    An exception from a callback is passed to on_error(text) and the loop
+    keeps running: it is the only thread serving its sockets.
+    """
+
+    def __init__(self, on_error: Optional[Callable[[str], None]] = None):
+        self._on_error = on_error
+        self._sel = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        # heap of (due, id, interval, callback); id breaks ties between callbacks
+        self._timers: List[Tuple[float, int, float, Callable]] = []
+        self._timer_ids = itertools.count()
+
+    def register(self, sock: socket.socket, callback: Callable) -> None:
+        with self._lock:
+            self._sel.register(sock, selectors.EVENT_READ, (callback, None))
+
+    def set_writer(self, sock: socket.socket, callback: Optional[Callable]) -> None:
+        """Also call callback(sock) while sock is writable; None stops that."""
+        events = selectors.EVENT_READ
+        if callback is not None:
+            events |= selectors.EVENT_WRITE
+        with self._lock:
+            try:
+                reader = self._sel.get_key(sock).data[0]
+                self._sel.modify(sock, events, (reader, callback))
+            except (KeyError, ValueError):
+                pass  # unregistered / closed meanwhile
+
+    def unregister(self, sock: socket.socket) -> None:
+        """Call BEFORE closing the socket."""
+        with self._lock:
+            try:
+                self._sel.unregister(sock)
+            except (KeyError, ValueError):
+                pass
+
+    def call_every(self, interval: float, callback: Callable, delay: float = 0.0):
+        """Run callback() every `interval` seconds on the loop thread, first after `delay`."""
+        with self._lock:
+            heapq.heappush(
+                self._timers,
+                (time.monotonic() + delay, next(self._timer_ids), interval, callback),
+            )
+
+    def run(self, stop_event: threading.Event, timeout: float = 0.5) -> None:
+        while not stop_event.is_set():
+            wait = self._run_due_timers(timeout)
+            if not self._sel.get_map():
+                stop_event.wait(wait)
+                continue
+            try:
+                events = self._sel.select(wait)
+            except OSError:
+                self._drop_closed()
+                continue
+            for key, mask in events:
+                reader, writer = key.data
+                if mask & selectors.EVENT_WRITE and writer is not None:
+                    self._call(writer, key.fileobj)
+                if mask & selectors.EVENT_READ and key.fileobj.fileno() != -1:
+                    self._call(reader, key.fileobj)
+
+    def _run_due_timers(self, timeout: float) -> float:
+        """Fire every due timer; return how long the loop may block afterwards."""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._timers and self._timers[0][0] <= now:
+                _, tid, interval, callback = heapq.heappop(self._timers)
+                heapq.heappush(self._timers, (now + interval, tid, interval, callback))
+                due.append(callback)
+            if self._timers:
+                timeout = min(timeout, max(0.0, self._timers[0][0] - now))
+        for callback in due:
+            self._call(callback)
+        return timeout
+
+    def _call(self, callback: Callable, *args) -> None:
+        try:
+            callback(*args)
+        except Exception as e:
+            if self._on_error is not None:
+                try:
+                    self._on_error(f"Event loop callback {callback!r} failed: {e!r}")
+                except Exception:
+                    pass
+
+    def _drop_closed(self) -> None:
+        # select()-based selectors (Windows) fail on a socket closed while registered
+        with self._lock:
+            for key in list(self._sel.get_map().values()):
+                if key.fileobj.fileno() == -1:
+                    self._sel.unregister(key.fileobj)
+
+    def close(self) -> None:
+        with self._lock:
+            self._sel.close()
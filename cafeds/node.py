@@ -2,47 +2,93 @@ import threading
 import time
 import socket
 import uuid
+import secrets
+import heapq
+import queue
 import os
-import json
+import select
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Optional, Set, Dict, Any
+from typing import Callable, Optional, Set, Dict, Any, Iterator, List, Tuple, Union
 
 from .config import (
     DISCOVERY_INTERVAL,
+    DISCOVERY_INTERVAL_MIN,
+    DISCOVERY_INTERVAL_MAX,
     HEARTBEAT_INTERVAL,
     LEADER_TIMEOUT,
     LOG_PREFIX,
     DISCOVERY_PORT,
+    DISCOVERY_LISTEN_ADDR,
+    DUPLICATE_WINDOW,
+    DISCOVERY_MULTICAST,
+    DISCOVERY_MCAST_GROUP,
+    DISCOVERY_MCAST_TTL,
     NODE_UDP_BASE,
     ELECTION_ANSWER_TIMEOUT,
     COORDINATOR_TIMEOUT,
     WAL_ENABLED,
     WAL_FILE,
-    HEARTBEAT_REDUNDANCY,
+    WAL_FORMAT,
+    WAL_USE_MMAP,
+    WAL_SYNC_INTERVAL,
+    WAL_SYNC_MODE,
+    HEARTBEAT_SEQ,
     PEER_EXPIRY,
+    ORDER_UUID_MEMORY,
+)
+from .udp_bus import (
+    make_udp_socket,
+    send_udp,
+    RecentDatagrams,
+    drain_udp,
+    send_many,
+    enable_multicast_send,
+    join_multicast,
 )
-from .udp_bus import make_udp_socket, send_udp, recv_udp
 from .proto import (
     encode,
     decode,
     who_is_leader,
     i_am_leader,
     leader_alive,
+    heartbeat_nack,
     election,
     answer,
     coordinator,
     new_order,
     order_msg,
     resend_request,
+    with_hb_seq,
 )
 from .tcp_server import TCPServer, ClientConn
+from .tcp_stream import encode_frame
 from .tcp_client import TCPClient
-from .net import primary_ip, local_ip_for_peer, discovery_targets
+from .wal import (
+    WalWriter,
+    encode_record,
+    iter_records,
+    open_for_replay,
+    valid_length,
+)
+from .seqlog import SeqLog
+from .logq import log_line, flush as flush_log
+from .net import (
+    primary_ip,
+    local_ip_for_peer,
+    broadcast_all,
+    refresh_discovery_targets,
+    EventLoop,
+    is_loopback,
+    is_unspecified,
+)
 
 # --------------- Dynamic Peer Registry ---------------
 
 
-@dataclass
+@dataclass(slots=True)
 class PeerInfo:
     """Represents a dynamically discovered peer node."""
 
@@ -50,10 +96,10 @@ class PeerInfo:
     ip: str
     udp_port: int
     tcp_port: int
-    last_seen: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.monotonic)
 
 
-@dataclass
+@dataclass(slots=True)
 class LeaderInfo:
     leader_id: int
     leader_ip: str
@@ -63,6 +109,49 @@ class LeaderInfo:
     last_seen_ts: float
 
 
+class RecentIds:
+    """
+    Remembers the last `capacity` order UUIDs for duplicate detection.
+
+    UUIDs (dashed, or the 32-hex-char ids from submit_order) are kept as
+    128-bit ints, about half the size of the string; anything that doesn't
+    parse as a UUID is kept as given. Not thread-safe: callers hold
+    seen_uuids_lock.
+    """
+
+    def __init__(self, capacity: int):
+        self._ring: deque = deque(maxlen=capacity)
+        self._set: Set[Union[int, str]] = set()
+
+    @staticmethod
+    def _key(order_uuid: str) -> Union[int, str]:
+        try:
+            return uuid.UUID(order_uuid).int
+        except ValueError:
+            return order_uuid
+
+    def __contains__(self, order_uuid: str) -> bool:
+        return self._key(order_uuid) in self._set
+
+    def __len__(self) -> int:
+        return len(self._set)
+
+    def add(self, order_uuid: str) -> bool:
+        """Remember order_uuid; returns True if it was already known."""
+        key = self._key(order_uuid)
+        if key in self._set:
+            return True
+        if len(self._ring) == self._ring.maxlen:
+            self._set.discard(self._ring[0])  # evicted by the append below
+        self._ring.append(key)
+        self._set.add(key)
+        return False
+
+    def update(self, order_uuids) -> None:
+        for u in order_uuids:
+            self.add(u)
+
+
 class Node:
     def __init__(self, node_id: int, role: str, tcp_port: int, ui: str):
         self.node_id = node_id
@@ -80,18 +169,41 @@ class Node:
                 f"CRITICAL: Port {self.node_udp_port} is already in use. Is node {node_id} running?"
             )
             raise
+        if DISCOVERY_MULTICAST:
+            # ID checks are sent to the group, so node sockets listen on it too
+            self._join_discovery_group(self.udp_node, sender=True)
 
         self.udp_disc: Optional[socket.socket] = None
         if role == "leader":
-            self.udp_disc = make_udp_socket(DISCOVERY_PORT)
+            self.udp_disc = self._make_disc_socket()
 
         self.stop_event = threading.Event()
+        # one selector thread serves udp_node + udp_disc
+        self.udp_loop = EventLoop(on_error=self.log)
+        # udp_node message type -> handler (see _on_udp_node_datagram)
+        self._udp_handlers = {
+            "I_AM_LEADER": self._on_i_am_leader,
+            "LEADER_ALIVE": self._on_leader_alive,
+            "ELECTION": self._on_election,
+            "ID_CHECK": self._on_id_check,
+            "HEARTBEAT_NACK": self._on_heartbeat_nack,
+            "ANSWER": self._on_answer,
+            "COORDINATOR": self._on_coordinator,
+        }
+        self._node_dups = RecentDatagrams(DUPLICATE_WINDOW)
+        self._disc_dups = RecentDatagrams(DUPLICATE_WINDOW)
 
         # Sequencer/log state (EVERYONE keeps history)
         self.epoch = 1
+        # epoch is raised from the UDP loop, the election thread and promotion;
+        # max() read-modify-writes must not interleave (no GIL on 3.13t)
+        self.epoch_lock = threading.Lock()
         self.last_seq = 0
-        self.history: Dict[int, Dict[str, Any]] = {}
+        self.history: SeqLog[Dict[str, Any]] = SeqLog()
         self.history_lock = threading.Lock()
+        # (order, TCP frame) per seq, filled when the leader sends an order;
+        # resends write the cached bytes. Guarded by history_lock.
+        self._order_frames: SeqLog[Tuple[Dict[str, Any], bytes]] = SeqLog()
 
         # Follower leader info
         self.leader: Optional[LeaderInfo] = None
@@ -104,8 +216,8 @@ class Node:
 
         # Total-order delivery (follower)
         self.expected_seq = 1
-        self.buffer: Dict[int, Dict[str, Any]] = {}
-        self.delivered_seqs: Set[int] = set()
+        # seq -> (order, already in the WAL) waiting for a gap to fill
+        self.buffer: Dict[int, Tuple[Dict[str, Any], bool]] = {}
         self.delivery_lock = threading.Lock()
         self.last_resend_ts = 0.0
 
@@ -114,37 +226,86 @@ class Node:
         self.in_election_since = 0.0
         self.answer_event = threading.Event()
         # UUID deduplication for orders (prevents duplicate processing)
-        self.seen_order_uuids: Set[str] = set()
+        self.seen_order_uuids = RecentIds(ORDER_UUID_MEMORY)
         self.seen_uuids_lock = threading.Lock()
 
         # WAL (Write-Ahead Log) for persistence
         self.wal_file = WAL_FILE.format(node_id=node_id) if WAL_ENABLED else None
+        self._wal_writer: Optional[WalWriter] = None
         if self.wal_file:
             self._recover_from_wal()
+            self._wal_writer = WalWriter(
+                self.wal_file, WAL_SYNC_INTERVAL, dsync=WAL_SYNC_MODE == "dsync"
+            )
+        # runs _after_wal() continuations in WAL order, off the writer thread
+        self._wal_publisher = ThreadPoolExecutor(1, thread_name_prefix="wal-publish")
 
         # Threads
         self.threads: Set[threading.Thread] = set()
 
-        self.coordinator_event = threading.Event()
-        self.coordinator_msg: Optional[Dict[str, Any]] = None
+        # latest COORDINATOR for a running election; message and wake-up are
+        # handed over together, so the waiter can't see one without the other
+        self._coord_q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=1)
         self.election_lock = threading.Lock()
 
         # leader heartbeat start guard
         self._heartbeat_started = False
+        # heartbeat sequencing (leader: last sent; follower: last received)
+        self._hb_seq = 0
+        # encoded latest heartbeat, re-sent as-is on HEARTBEAT_NACK
+        self._last_heartbeat: Optional[bytes] = None
+        self._leader_hb_seq = 0
 
         # ---- Dynamic Peer Registry ----
         self.peers: Dict[int, PeerInfo] = {}
+        # node_id -> last_seen, kept in step with peers so expiry scans one dict
+        self._peer_last_seen: Dict[int, float] = {}
+        # expiry schedule: (last_seen when scheduled, node_id), one entry per
+        # node in _peer_heap_ids; _prune_peers re-schedules peers seen since
+        self._peer_heap: List[Tuple[float, int]] = []
+        self._peer_heap_ids: Set[int] = set()
+        # (ip, udp_port) of every peer for fan-out sends; None = rebuild on next use.
+        # Reusing the same tuple also reuses send_many's prebuilt sockaddr batch.
+        self._peer_addrs: Optional[Tuple[Tuple[str, int], ...]] = None
+        # heartbeat "cluster" list, same invalidation as _peer_addrs
+        self._hb_cluster: Optional[List[Dict[str, Any]]] = None
+        # ((epoch, last_seq), cluster list, encoded LEADER_ALIVE) of the last tick
+        self._hb_template: Optional[Tuple[Tuple[int, int], List, bytes]] = None
         self.peers_lock = threading.Lock()
 
-    def log(self, msg: str) -> None:
-        print(
+        # WHO_IS_LEADER backoff (see _next_discovery_delay)
+        self._discovery_interval = DISCOVERY_INTERVAL_MIN
+        self._discovery_peer_ids: frozenset = frozenset()
+        self._next_discovery_ts = 0.0
+
+    def _make_disc_socket(self) -> socket.socket:
+        s = make_udp_socket(DISCOVERY_PORT, broadcast=False, host=DISCOVERY_LISTEN_ADDR)
+        if DISCOVERY_MULTICAST:
+            self._join_discovery_group(s)
+        return s
+
+    def _join_discovery_group(self, sock: socket.socket, sender: bool = False) -> None:
+        # Failure is logged, not fatal: unicast replies and 127.0.0.1 still work
+        ip = primary_ip()
+        iface = "0.0.0.0" if is_loopback(ip) else ip
+        try:
+            join_multicast(sock, DISCOVERY_MCAST_GROUP, iface)
+            if sender:
+                enable_multicast_send(sock, DISCOVERY_MCAST_TTL, iface)
+        except OSError as e:
+            self.log(f"Multicast setup failed on {iface}: {e}")
+
+    def log(self, msg: str, keep: bool = False) -> None:
+        log_line(
             f"{LOG_PREFIX} [id={self.node_id} role={self.role} udp_node={self.node_udp_port}] {msg}",
-            flush=True,
+            keep,
         )
 
     # ---------------- Dynamic Peer Registry ----------------
 
-    def _register_peer(self, node_id: int, ip: str, tcp_port: int = 0) -> None:
+    def _register_peer(
+        self, node_id: int, ip: str, tcp_port: int = 0, now: Optional[float] = None
+    ) -> None:
         """Register or update a dynamically discovered peer."""
         if node_id == self.node_id:
             # DUPLICATE ID DETECTION: another node claims OUR id from a different IP
@@ -157,25 +318,40 @@ class Node:
                 )
             return  # don't register self
         udp_port = NODE_UDP_BASE + node_id
+        if now is None:
+            now = time.monotonic()
         with self.peers_lock:
+            self._peer_last_seen[node_id] = now
+            if node_id not in self._peer_heap_ids:
+                self._peer_heap_ids.add(node_id)
+                heapq.heappush(self._peer_heap, (now, node_id))
             existing = self.peers.get(node_id)
             if existing:
+                if existing.ip != ip or (tcp_port and existing.tcp_port != tcp_port):
+                    self._invalidate_peer_views()
                 existing.ip = ip
                 existing.udp_port = udp_port
                 if tcp_port:
                     existing.tcp_port = tcp_port
-                existing.last_seen = time.time()
+                existing.last_seen = now
             else:
+                self._invalidate_peer_views()
                 self.peers[node_id] = PeerInfo(
                     node_id=node_id,
                     ip=ip,
                     udp_port=udp_port,
                     tcp_port=tcp_port,
-                    last_seen=time.time(),
-                )
-                self.log(
-                    f"Peer discovered: id={node_id} ip={ip} udp={udp_port} tcp={tcp_port}"
+                    last_seen=now,
                 )
+        if not existing:
+            self.log(
+                f"Peer discovered: id={node_id} ip={ip} udp={udp_port} tcp={tcp_port}"
+            )
+
+    def _invalidate_peer_views(self) -> None:
+        """Drop views derived from the registry (caller holds peers_lock)."""
+        self._peer_addrs = None
+        self._hb_cluster = None
 
     def _get_peer_ids(self) -> list:
         """Return list of known peer IDs (excluding self)."""
@@ -184,65 +360,129 @@ class Node:
 
     def _prune_peers(self) -> None:
         """Remove peers not seen for PEER_EXPIRY seconds."""
-        now = time.time()
+        now = time.monotonic()
+        heap = self._peer_heap
+        expired = False
         with self.peers_lock:
-            expired = [
-                pid
-                for pid, p in self.peers.items()
-                if (now - p.last_seen) > PEER_EXPIRY
-            ]
-            for pid in expired:
-                del self.peers[pid]
+            # only entries scheduled more than PEER_EXPIRY ago are looked at
+            while heap and (now - heap[0][0]) > PEER_EXPIRY:
+                _, pid = heapq.heappop(heap)
+                seen = self._peer_last_seen.get(pid)
+                if seen is not None and (now - seen) <= PEER_EXPIRY:
+                    heapq.heappush(heap, (seen, pid))  # seen since: re-schedule
+                    continue
+                self._peer_heap_ids.discard(pid)
+                if seen is not None:
+                    del self.peers[pid]
+                    del self._peer_last_seen[pid]
+                    expired = True
+            if expired:
+                self._invalidate_peer_views()
                 # (logging removed to avoid spam)
 
     # ---------------- WAL (Write-Ahead Log) ----------------
 
     def _append_to_wal(self, order: Dict[str, Any]) -> None:
         """Persist order to disk before acknowledging (crash durability)."""
-        if not self.wal_file:
+        if not self._wal_writer:
             return
         try:
-            with open(self.wal_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(order, separators=(",", ":")) + "\n")
-                f.flush()
-                os.fsync(f.fileno())  # Ensure durably written to disk
+            # blocks until fdatasync'd; concurrent appends share one sync
+            self._wal_writer.append(encode_record(order, WAL_FORMAT))
         except Exception as e:
             self.log(f"WAL write error: {e}")
 
+    def _publish_after_wal(self, om: Dict[str, Any]) -> None:
+        """Leader: persist a freshly sequenced order, then deliver + broadcast it.
+
+        Caller holds history_lock, so orders reach the WAL in seq order and
+        are published in that same order on the _wal_publisher thread.
+        """
+        frame = self._order_frame(om)
+
+        def publish() -> None:
+            self._process_order(om, persisted=True)
+            server = self.tcp_server
+            if server is not None:
+                server.broadcast_frame(frame)
+
+        self._after_wal(om, publish)
+
+    def _after_wal(self, order: Dict[str, Any], then: Callable[[], None]) -> None:
+        """Persist order, then call then() once it is durable.
+
+        Never blocks and never runs then() inline: it runs on the single
+        _wal_publisher thread, in the order of the _after_wal() calls. Like
+        _append_to_wal, a write error is logged and then() still runs.
+        """
+        if self._wal_writer:
+            try:
+                done = self._wal_writer.submit(encode_record(order, WAL_FORMAT))
+            except Exception as e:
+                self.log(f"WAL write error: {e}")
+            else:
+
+                def on_done(f: Future) -> None:
+                    if f.exception() is not None:
+                        self.log(f"WAL write error: {f.exception()}")
+                    # not on the writer thread: then() may append to the WAL itself
+                    self._run_published(then)
+
+                done.add_done_callback(on_done)
+                return
+        self._run_published(then)
+
+    def _run_published(self, then: Callable[[], None]) -> None:
+        try:
+            self._wal_publisher.submit(then)
+        except RuntimeError:
+            pass  # stopping
+
     def _recover_from_wal(self) -> None:
         """Recover order history from WAL on startup."""
         if not self.wal_file or not os.path.exists(self.wal_file):
             return
         recovered = 0
+        history = self.history
+        last_seq = self.last_seq
+        uuids = []
         try:
-            with open(self.wal_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
+            with open_for_replay(self.wal_file, WAL_USE_MMAP) as data:
+                total = len(data)
+                good = valid_length(data, WAL_FORMAT)
+                for order in iter_records(data, WAL_FORMAT, end=good):
                     try:
-                        order = json.loads(line)
                         seq = int(order.get("seq", 0))
-                        order_uuid = str(order.get("order_uuid", ""))
                         if seq > 0:
-                            self.history[seq] = order
-                            self.last_seq = max(self.last_seq, seq)
-                            if order_uuid:
-                                self.seen_order_uuids.add(order_uuid)
+                            history[seq] = order
+                            if seq > last_seq:
+                                last_seq = seq
+                            uuids.append(order.get("order_uuid"))
                             recovered += 1
                     except Exception:
                         pass
-                self.log(f"WAL recovered {recovered} orders, last_seq={self.last_seq}")
-                # Update the next expected sequence number so that new orders can be delivered.
-                with self.delivery_lock:
-                    self.expected_seq = self.last_seq + 1
-                    self.delivered_seqs.update(range(1, self.expected_seq))
+            self.last_seq = last_seq
+            # seq already makes replay idempotent; only recent UUIDs matter
+            recent = uuids[-ORDER_UUID_MEMORY:]
+            self.seen_order_uuids.update(str(u) for u in recent if u)
+            if good < total:
+                # Drop a torn/corrupt tail so new appends stay readable
+                with open(self.wal_file, "r+b") as f:
+                    f.truncate(good)
+                self.log(f"WAL truncated {total - good} bytes of damaged tail")
+            self.log(f"WAL recovered {recovered} orders, last_seq={self.last_seq}")
+            # Update the next expected sequence number so that new orders can be delivered.
+            with self.delivery_lock:
+                self.expected_seq = self.last_seq + 1
         except Exception as e:
             self.log(f"WAL recovery error: {e}")
 
     # ---------------- RUN ----------------
 
     def run(self) -> None:
+        if not getattr(sys, "_is_gil_enabled", lambda: True)():
+            self.log("Free-threaded interpreter: listeners run in parallel.")
+
         # ---- Duplicate ID check: probe the network before starting ----
         if not self._check_id_available():
             return  # ID already in use, refuse to start
@@ -262,18 +502,16 @@ class Node:
                         pass
                     self.udp_disc = None
 
-        t1 = threading.Thread(target=self._udp_node_listener, daemon=True)
+        self.udp_loop.register(self.udp_node, self._on_udp_node_readable)
+        if self.udp_disc is not None:
+            self.udp_loop.register(self.udp_disc, self._on_udp_disc_readable)
+        t1 = threading.Thread(target=self._udp_event_loop, daemon=True)
         t1.start()
         self.threads.add(t1)
 
-        if self.udp_disc is not None:
-            t2 = threading.Thread(target=self._udp_disc_listener, daemon=True)
-            t2.start()
-            self.threads.add(t2)
-
         if self.role == "leader":
             self._start_tcp_leader()
-            self._start_leader_heartbeat_thread()
+            self._start_leader_heartbeat()
         else:
             self._start_tcp_follower()
             if self.ui == "waiter":
@@ -286,8 +524,9 @@ class Node:
         self.threads.add(tf)
 
         self.log("Node is running.")
-        while not self.stop_event.is_set():
-            time.sleep(0.5)
+        # timed wait: a bare wait() isn't interruptible by Ctrl+C on Windows
+        while not self.stop_event.wait(0.5):
+            pass
 
     def _check_id_available(self) -> bool:
         """Probe the network to see if our node ID is already in use.
@@ -305,40 +544,23 @@ class Node:
         )
 
         # Send probe to all discovery targets on our own UDP port
-        for ip in discovery_targets():
-            try:
-                send_udp(self.udp_node, probe, ip, self.node_udp_port)
-            except Exception:
-                pass
+        self._broadcast_payload(probe, self.node_udp_port)
 
         # Listen for ID_TAKEN responses (1 second window is enough for LAN)
         self.log(f"Checking if node ID {self.node_id} is available on the network...")
-        old_timeout = self.udp_node.gettimeout()
-        self.udp_node.settimeout(0.3)
-        deadline = time.time() + 1.0
-
-        while time.time() < deadline:
-            try:
-                data, (src_ip, _) = self.udp_node.recvfrom(4096)
-                msg = decode(data)
-                if (
-                    msg.get("type") == "ID_TAKEN"
-                    and msg.get("token") == token
-                    and msg.get("node_id") == self.node_id
-                ):
-                    self.log(
-                        f"\u274c ERROR: Node ID {self.node_id} is already in use "
-                        f"by {src_ip}. Cannot start. "
-                        f"Please choose a different --id."
-                    )
-                    self.udp_node.settimeout(old_timeout)
-                    return False
-            except socket.timeout:
-                continue
-            except Exception:
-                continue
+        for msg, src_ip in self._probe_replies(time.monotonic() + 1.0):
+            if (
+                msg.get("type") == "ID_TAKEN"
+                and msg.get("token") == token
+                and msg.get("node_id") == self.node_id
+            ):
+                self.log(
+                    f"\u274c ERROR: Node ID {self.node_id} is already in use "
+                    f"by {src_ip}. Cannot start. "
+                    f"Please choose a different --id."
+                )
+                return False
 
-        self.udp_node.settimeout(old_timeout)
         self.log(f"Node ID {self.node_id} is available. Proceeding.")
         return True
 
@@ -355,39 +577,40 @@ class Node:
         probe = encode(who_is_leader(self.node_id, self.tcp_port))
 
         # Send probe to all discovery targets on DISCOVERY_PORT
-        for ip in discovery_targets():
-            try:
-                send_udp(self.udp_node, probe, ip, DISCOVERY_PORT)
-            except Exception:
-                pass
+        self._broadcast_payload(probe, DISCOVERY_PORT)
 
         # Listen for I_AM_LEADER responses (1 second window)
         self.log("Checking for existing leader...")
-        old_timeout = self.udp_node.gettimeout()
-        self.udp_node.settimeout(0.3)
-        deadline = time.time() + 1.0
+        for msg, src_ip in self._probe_replies(time.monotonic() + 1.0):
+            if msg.get("type") == "I_AM_LEADER":
+                lid = msg.get("leader_id")
+                lip = msg.get("leader_ip")
+                self.log(
+                    f"DEBUG: I_AM_LEADER received from {lid} @ {src_ip} (claim ip={lip}). I am {self.node_id}."
+                )
+                self.log(f"Found existing leader: {lid} @ {src_ip}")
+                return True
+        return False
 
-        found_leader = False
-        while time.time() < deadline:
-            try:
-                data, (src_ip, _) = self.udp_node.recvfrom(4096)
-                msg = decode(data)
-                if msg.get("type") == "I_AM_LEADER":
-                    lid = msg.get("leader_id")
-                    lip = msg.get("leader_ip")
-                    self.log(
-                        f"DEBUG: I_AM_LEADER received from {lid} @ {src_ip} (claim ip={lip}). I am {self.node_id}."
-                    )
-                    self.log(f"Found existing leader: {lid} @ {src_ip}")
-                    found_leader = True
-                    break
-            except socket.timeout:
-                continue
-            except Exception:
-                continue
+    def _probe_replies(self, deadline: float) -> Iterator[Tuple[Dict[str, Any], str]]:
+        """Yield (msg, src_ip) for datagrams reaching udp_node before deadline.
 
-        self.udp_node.settimeout(old_timeout)
-        return found_leader
+        Blocks in select() for exactly the remaining budget, then drains the
+        queue without blocking; the socket's timeout is never changed.
+        """
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            ready, _, _ = select.select([self.udp_node], [], [], remaining)
+            if not ready:
+                return
+            for data, (src_ip, _) in drain_udp(self.udp_node):
+                try:
+                    msg = decode(data)
+                except Exception:
+                    continue
+                yield msg, src_ip
 
     # ---------------- UDP HELPERS ----------------
 
@@ -400,54 +623,55 @@ class Node:
         If we know the peer's IP from the registry, send directly.
         Otherwise fall back to broadcast so that unknown peers can still be reached.
         """
-        payload = encode(msg)
+        self._send_payload_to_node(target_id, encode(msg))
+
+    def _send_payload_to_node(self, target_id: int, payload: bytes) -> None:
         port = self._port_of(target_id)
 
         with self.peers_lock:
             peer = self.peers.get(target_id)
+            ip = peer.ip if peer else None
 
-        if peer and not peer.ip.startswith("0."):
+        if ip and not is_unspecified(ip):
             # Send directly to known peer IP
             try:
-                send_udp(self.udp_node, payload, peer.ip, port)
+                send_udp(self.udp_node, payload, ip, port)
             except Exception:
                 pass
             return
 
         # Fallback: broadcast to all discovery targets
-        for ip in discovery_targets():
-            try:
-                send_udp(self.udp_node, payload, ip, port)
-            except Exception:
-                pass
+        self._broadcast_payload(payload, port)
 
     def _broadcast_to_all_peers(self, msg: Dict[str, Any]) -> None:
         """Send a UDP message to ALL known peers (used for heartbeats, coordinator)."""
-        payload = encode(msg)
-        peer_ids = self._get_peer_ids()
-        for pid in peer_ids:
-            port = self._port_of(pid)
-            with self.peers_lock:
-                peer = self.peers.get(pid)
-            if peer:
-                try:
-                    send_udp(self.udp_node, payload, peer.ip, port)
-                except Exception:
-                    pass
+        self._send_payload_to_peers(encode(msg))
+
+    def _send_payload_to_peers(self, payload: bytes) -> None:
+        # one snapshot under the lock, sends happen outside it
+        with self.peers_lock:
+            addrs = self._peer_addrs
+            if addrs is None:
+                addrs = self._peer_addrs = tuple(
+                    (p.ip, self._port_of(pid))
+                    for pid, p in self.peers.items()
+                    if pid != self.node_id
+                )
+        send_many(self.udp_node, payload, addrs)
 
     def _broadcast_to_discovery(self, msg: Dict[str, Any], port: int) -> None:
         """Broadcast a message via discovery targets (for reaching unknown nodes)."""
-        payload = encode(msg)
-        for ip in discovery_targets():
-            try:
-                send_udp(self.udp_node, payload, ip, port)
-            except Exception:
-                pass
+        self._broadcast_payload(encode(msg), port)
+
+    def _broadcast_payload(self, payload: bytes, port: int) -> None:
+        if broadcast_all(self.udp_node, payload, port):
+            # Network interface probably changed; rebuild targets for next round
+            refresh_discovery_targets()
 
     def _safe_start_election(self, reason: str = "") -> None:
         if self.role == "leader":
             return
-        now = time.time()
+        now = time.monotonic()
         with self.election_lock:
             # single-flight: don't start another election if one started recently
             if self.in_election and (now - self.in_election_since) < 2.0:
@@ -473,8 +697,8 @@ class Node:
             return new.leader_id > cur.leader_id
 
         # Same leader: prefer non-loopback over loopback
-        cur_loop = cur.leader_ip.startswith("127.")
-        new_loop = new.leader_ip.startswith("127.")
+        cur_loop = is_loopback(cur.leader_ip)
+        new_loop = is_loopback(new.leader_ip)
         if cur_loop and not new_loop:
             return True
         if not cur_loop and new_loop:
@@ -488,7 +712,8 @@ class Node:
 
     # ---------------- ORDER PROCESSING ----------------
 
-    def _process_order(self, msg: Dict[str, Any]) -> None:
+    def _process_order(self, msg: Dict[str, Any], persisted: bool = False) -> None:
+        """Store, then deliver in seq order; persisted=True: msg is in the WAL."""
         if not msg:
             return
         try:
@@ -500,19 +725,22 @@ class Node:
 
         # keep history for leader handover
         with self.history_lock:
-            self.history[seq] = msg
+            try:
+                self.history[seq] = msg
+            except KeyError:
+                self.log(f"ORDER seq={seq} ignored (too far beyond {self.last_seq})")
+                return
             self.last_seq = max(self.last_seq, seq)
 
         with self.delivery_lock:
-            # dedup
-            if seq in self.delivered_seqs or seq < self.expected_seq:
-                self.delivered_seqs.add(seq)
+            # dedup: delivery is in order, so everything below expected_seq is done
+            if seq < self.expected_seq:
                 return
 
             # gap => buffer + resend request
             if seq > self.expected_seq:
-                self.buffer[seq] = msg
-                now = time.time()
+                self.buffer[seq] = (msg, persisted)
+                now = time.monotonic()
                 if (
                     self.tcp_client
                     and self.tcp_connected
@@ -536,249 +764,317 @@ class Node:
 
             # seq == expected => deliver and flush
             self._deliver(msg)
-            self._append_to_wal(msg)  # persist to WAL on delivery
-            self.delivered_seqs.add(seq)
+            if not persisted:
+                self._append_to_wal(msg)  # persist to WAL on delivery
             self.expected_seq += 1
 
             while self.expected_seq in self.buffer:
-                m2 = self.buffer.pop(self.expected_seq)
-                s2 = self.expected_seq
-                if s2 in self.delivered_seqs:
-                    self.expected_seq += 1
-                    continue
+                m2, m2_persisted = self.buffer.pop(self.expected_seq)
                 self._deliver(m2)
-                self._append_to_wal(m2)  # persist to WAL on delivery
-                self.delivered_seqs.add(s2)
+                if not m2_persisted:
+                    self._append_to_wal(m2)  # persist to WAL on delivery
                 self.expected_seq += 1
 
     # ---------------- UDP LISTENERS ----------------
 
-    def _udp_node_listener(self) -> None:
-        self.log("UDP node listener started.")
-        while not self.stop_event.is_set():
-            try:
-                data, (src_ip, src_port) = recv_udp(self.udp_node)
-                msg = decode(data)
-                mtype = msg.get("type")
-
-                # --- Register peer from any incoming message ---
-                sender_id = (
-                    msg.get("sender_id")
-                    or msg.get("leader_id")
-                    or msg.get("candidate_id")
-                    or msg.get("responder_id")
-                )
-                sender_tcp = (
-                    msg.get("sender_tcp_port")
-                    or msg.get("leader_tcp_port")
-                    or msg.get("candidate_tcp_port")
-                    or msg.get("responder_tcp_port")
-                    or 0
-                )
-                if sender_id is not None:
-                    try:
-                        self._register_peer(int(sender_id), src_ip, int(sender_tcp))
-                    except (ValueError, TypeError):
-                        pass
+    def _udp_event_loop(self) -> None:
+        self.log("UDP listener started.")
+        self.udp_loop.run(self.stop_event)
+        self.udp_loop.close()
 
-                if mtype == "I_AM_LEADER" and self.role == "follower":
-                    new = LeaderInfo(
-                        leader_id=int(msg.get("leader_id", -1)),
-                        leader_ip=src_ip,  # use real sender IP (multi-PC safe)
-                        leader_tcp_port=int(msg.get("leader_tcp_port", 0)),
-                        epoch=int(msg.get("epoch", 1)),
-                        last_seq=int(msg.get("last_seq", 0)),
-                        last_seen_ts=time.time(),
-                    )
+    def _on_udp_node_readable(self, sock: socket.socket) -> None:
+        for data, (src_ip, src_port) in drain_udp(sock):
+            self._on_udp_node_datagram(data, src_ip, src_port)
 
-                    if self._is_better_leader(new):
-                        # Reset TCP so we reconnect to the correct leader
-                        if self.leader and new.leader_id != self.leader.leader_id:
-                            self._close_tcp_client()
-                        self.leader = new
-                        self.epoch = max(self.epoch, new.epoch)
-                        self.log(
-                            f"Leader discovered: {new.leader_id} @ {new.leader_ip}:{new.leader_tcp_port} (epoch={new.epoch})"
-                        )
-
-                elif mtype == "LEADER_ALIVE" and self.role == "follower":
-                    lid = int(msg.get("leader_id", -1))
-                    e = int(msg.get("epoch", 1))
-                    ls = int(msg.get("last_seq", 0))
-                    ltcp = int(msg.get("leader_tcp_port", 0))
-
-                    # If leader unknown, accept heartbeat as "someone exists"
-                    if self.leader is None:
-                        self.leader = LeaderInfo(
-                            leader_id=lid,
-                            leader_ip=src_ip,
-                            leader_tcp_port=ltcp,
-                            epoch=e,
-                            last_seq=ls,
-                            last_seen_ts=time.time(),
-                        )
-                    else:
-                        # only refresh if same leader or higher epoch
-                        if lid == self.leader.leader_id or e > self.leader.epoch:
-                            self.leader.last_seen_ts = time.time()
-                            self.leader.epoch = max(self.leader.epoch, e)
-                            self.leader.last_seq = max(self.leader.last_seq, ls)
-                            # Update leader IP to currently seen src_ip
-                            # (handles IP changes / reconnects)
-                            self.leader.leader_ip = src_ip
-                            if ltcp:
-                                self.leader.leader_tcp_port = ltcp
-                    self.epoch = max(self.epoch, e)
-
-                    # Register sibling peers from leader's cluster list
-                    # This allows followers to know about each other for elections
-                    cluster = msg.get("cluster", [])
-                    for peer_entry in cluster:
-                        try:
-                            pid = int(peer_entry.get("id", 0))
-                            pip = str(peer_entry.get("ip", ""))
-                            ptcp = int(peer_entry.get("tcp", 0))
-                            if pid and pip:
-                                self._register_peer(pid, pip, ptcp)
-                        except (ValueError, TypeError, AttributeError):
-                            pass
-
-                if mtype == "ELECTION":
-                    cand = int(msg.get("candidate_id", -1))
-                    e = int(msg.get("epoch", 1))
-                    if self.node_id > cand:
-                        try:
-                            send_udp(
-                                self.udp_node,
-                                encode(
-                                    answer(
-                                        self.node_id, max(self.epoch, e), self.tcp_port
-                                    )
-                                ),
-                                src_ip,
-                                src_port,
-                            )
-                        except Exception:
-                            pass
-                        # higher node should also start its own election
-                        self._safe_start_election("Received ELECTION from lower node")
-
-                elif mtype == "ID_CHECK":
-                    # Another node is probing to see if our ID is taken
-                    check_id = msg.get("node_id")
-                    check_token = msg.get("token")
-                    if check_id == self.node_id and check_token:
-                        reply = encode(
-                            {
-                                "type": "ID_TAKEN",
-                                "node_id": self.node_id,
-                                "token": check_token,
-                            }
-                        )
-                        try:
-                            send_udp(self.udp_node, reply, src_ip, src_port)
-                        except Exception:
-                            pass
-
-                elif mtype == "ANSWER":
-                    self.answer_event.set()
-
-                elif mtype == "COORDINATOR":
-                    # save coordinator msg for election thread
-                    self.coordinator_msg = msg
-                    self.coordinator_event.set()
-
-                    lead_id = int(msg.get("leader_id", -1))
-                    e = int(msg.get("epoch", 1))
-
-                    # If I'm leader but see a legitimate higher coordinator, step down.
-                    # Bully rule: higher epoch wins; at same epoch, higher ID wins.
-                    should_step_down = (
-                        self.role == "leader"
-                        and lead_id != self.node_id
-                        and (
-                            e > self.epoch
-                            or (e == self.epoch and lead_id > self.node_id)
-                        )
-                    )
-                    if should_step_down:
-                        self.log(f"Stepping down: coordinator {lead_id} epoch={e}")
-                        self._demote_to_follower(
-                            LeaderInfo(
-                                leader_id=lead_id,
-                                leader_ip=src_ip,  # real sender IP
-                                leader_tcp_port=int(msg.get("leader_tcp_port", 0)),
-                                epoch=e,
-                                last_seq=int(msg.get("last_seq", 0)),
-                                last_seen_ts=time.time(),
-                            )
-                        )
-
-                    # As follower receiving COORDINATOR: reset TCP to reconnect to new leader
-                    if self.role == "follower":
-                        new_leader = LeaderInfo(
-                            leader_id=lead_id,
-                            leader_ip=src_ip,
-                            leader_tcp_port=int(msg.get("leader_tcp_port", 0)),
-                            epoch=e,
-                            last_seq=int(msg.get("last_seq", 0)),
-                            last_seen_ts=time.time(),
-                        )
-                        if self.leader is None or lead_id != self.leader.leader_id:
-                            self._close_tcp_client()
-                        self.leader = new_leader
-                        self.epoch = max(self.epoch, e)
-
-            except socket.timeout:
-                continue
-            except OSError:
-                if self.stop_event.is_set():
-                    break
-            except Exception as e:
-                self.log(f"UDP node listener error: {e}")
+    def _on_udp_node_datagram(self, data: bytes, src_ip: str, src_port: int) -> None:
+        try:
+            now = time.monotonic()  # one clock read per datagram
+            if self._node_dups.is_duplicate(src_port, data):
+                return
+            msg = decode(data)
+
+            # --- Register peer from any incoming message ---
+            sender_id = (
+                msg.get("sender_id")
+                or msg.get("leader_id")
+                or msg.get("candidate_id")
+                or msg.get("responder_id")
+            )
+            sender_tcp = (
+                msg.get("sender_tcp_port")
+                or msg.get("leader_tcp_port")
+                or msg.get("candidate_tcp_port")
+                or msg.get("responder_tcp_port")
+                or 0
+            )
+            if sender_id is not None:
+                try:
+                    sender_id = int(sender_id)
+                    self._register_peer(sender_id, src_ip, int(sender_tcp), now)
+                except (ValueError, TypeError):
+                    sender_id = None
 
-    def _udp_disc_listener(self) -> None:
-        assert self.udp_disc is not None
-        self.log("UDP discovery listener started.")
-        while not self.stop_event.is_set():
+            handler = self._udp_handlers.get(msg.get("type"))
+            if handler is not None:
+                handler(msg, src_ip, src_port, now, sender_id)
+
+        except OSError:
+            return  # socket closed (stop / demotion)
+        except Exception as e:
+            self.log(f"UDP node listener error: {e}")
+
+    # Handlers for udp_node messages: (msg, src_ip, src_port, now, sender_id).
+    # sender_id is the already-registered int id, or None.
+
+    def _on_i_am_leader(
+        self,
+        msg: Dict[str, Any],
+        src_ip: str,
+        src_port: int,
+        now: float,
+        sender_id: Optional[int],
+    ) -> None:
+        if self.role != "follower":
+            return
+        new = LeaderInfo(
+            leader_id=int(msg.get("leader_id", -1)),
+            leader_ip=src_ip,  # use real sender IP (multi-PC safe)
+            leader_tcp_port=int(msg.get("leader_tcp_port", 0)),
+            epoch=int(msg.get("epoch", 1)),
+            last_seq=int(msg.get("last_seq", 0)),
+            last_seen_ts=now,
+        )
+
+        if self._is_better_leader(new):
+            # Reset TCP so we reconnect to the correct leader
+            if self.leader and new.leader_id != self.leader.leader_id:
+                self._close_tcp_client()
+            self.leader = new
+            self._observe_epoch(new.epoch)
+            self.log(
+                f"Leader discovered: {new.leader_id} @ {new.leader_ip}:{new.leader_tcp_port} (epoch={new.epoch})"
+            )
+
+    def _on_leader_alive(
+        self,
+        msg: Dict[str, Any],
+        src_ip: str,
+        src_port: int,
+        now: float,
+        sender_id: Optional[int],
+    ) -> None:
+        if self.role != "follower":
+            return
+        lid = int(msg.get("leader_id", -1))
+        e = int(msg.get("epoch", 1))
+        ls = int(msg.get("last_seq", 0))
+        ltcp = int(msg.get("leader_tcp_port", 0))
+        same_leader = self.leader is not None and self.leader.leader_id == lid
+
+        # If leader unknown, accept heartbeat as "someone exists"
+        if self.leader is None:
+            self.leader = LeaderInfo(
+                leader_id=lid,
+                leader_ip=src_ip,
+                leader_tcp_port=ltcp,
+                epoch=e,
+                last_seq=ls,
+                last_seen_ts=now,
+            )
+        else:
+            # only refresh if same leader or higher epoch
+            if lid == self.leader.leader_id or e > self.leader.epoch:
+                self.leader.last_seen_ts = now
+                self.leader.epoch = max(self.leader.epoch, e)
+                self.leader.last_seq = max(self.leader.last_seq, ls)
+                # Update leader IP to currently seen src_ip
+                # (handles IP changes / reconnects)
+                self.leader.leader_ip = src_ip
+                if ltcp:
+                    self.leader.leader_tcp_port = ltcp
+        self._observe_epoch(e)
+        # newest hb_seq from the current leader (reported in silence NACKs);
+        # a late older heartbeat must not move it back
+        if self.leader.leader_id == lid:
+            hb_seq = int(msg.get("hb_seq", 0))
+            if same_leader:
+                hb_seq = max(self._leader_hb_seq, hb_seq)
+            self._leader_hb_seq = hb_seq
+
+        # Register sibling peers from leader's cluster list
+        # This allows followers to know about each other for elections
+        cluster = msg.get("cluster", [])
+        for peer_entry in cluster:
             try:
-                data, (src_ip, src_port) = recv_udp(self.udp_disc)
-                msg = decode(data)
-                if msg.get("type") == "WHO_IS_LEADER" and self.role == "leader":
-                    # Register the querying peer
-                    sid = msg.get("sender_id")
-                    stcp = msg.get("sender_tcp_port", 0)
-                    if sid is not None:
-                        try:
-                            self._register_peer(int(sid), src_ip, int(stcp))
-                        except (ValueError, TypeError):
-                            pass
-
-                    reply = i_am_leader(
-                        leader_id=self.node_id,
-                        leader_ip=local_ip_for_peer(src_ip),
-                        leader_tcp_port=self.tcp_port,
-                        epoch=self.epoch,
-                        last_seq=self.last_seq,
-                    )
-                    send_udp(self.udp_disc, encode(reply), src_ip, src_port)
-            except socket.timeout:
-                continue
-            except OSError:
-                if self.stop_event.is_set():
-                    break
+                pid = int(peer_entry.get("id", 0))
+                pip = str(peer_entry.get("ip", ""))
+                ptcp = int(peer_entry.get("tcp", 0))
+                if pid and pip:
+                    self._register_peer(pid, pip, ptcp, now)
+            except (ValueError, TypeError, AttributeError):
+                pass
+
+    def _on_election(
+        self,
+        msg: Dict[str, Any],
+        src_ip: str,
+        src_port: int,
+        now: float,
+        sender_id: Optional[int],
+    ) -> None:
+        cand = int(msg.get("candidate_id", -1))
+        e = int(msg.get("epoch", 1))
+        if self.node_id > cand:
+            try:
+                send_udp(
+                    self.udp_node,
+                    encode(answer(self.node_id, max(self.epoch, e), self.tcp_port)),
+                    src_ip,
+                    src_port,
+                )
+            except Exception:
+                pass
+            # higher node should also start its own election
+            self._safe_start_election("Received ELECTION from lower node")
+
+    def _on_id_check(
+        self,
+        msg: Dict[str, Any],
+        src_ip: str,
+        src_port: int,
+        now: float,
+        sender_id: Optional[int],
+    ) -> None:
+        # Another node is probing to see if our ID is taken
+        check_id = msg.get("node_id")
+        check_token = msg.get("token")
+        if check_id == self.node_id and check_token:
+            reply = encode(
+                {
+                    "type": "ID_TAKEN",
+                    "node_id": self.node_id,
+                    "token": check_token,
+                }
+            )
+            try:
+                send_udp(self.udp_node, reply, src_ip, src_port)
             except Exception:
                 pass
 
+    def _on_heartbeat_nack(
+        self,
+        msg: Dict[str, Any],
+        src_ip: str,
+        src_port: int,
+        now: float,
+        sender_id: Optional[int],
+    ) -> None:
+        # Follower missed a heartbeat: re-send the latest one directly,
+        # unless it already has that one (nothing newer to give it)
+        hb = self._last_heartbeat
+        if self.role != "leader" or hb is None or sender_id is None:
+            return
+        if int(msg.get("last_hb_seq", 0)) >= self._hb_seq:
+            return
+        self._send_payload_to_node(sender_id, hb)
+
+    def _on_answer(
+        self,
+        msg: Dict[str, Any],
+        src_ip: str,
+        src_port: int,
+        now: float,
+        sender_id: Optional[int],
+    ) -> None:
+        self.answer_event.set()
+
+    def _on_coordinator(
+        self,
+        msg: Dict[str, Any],
+        src_ip: str,
+        src_port: int,
+        now: float,
+        sender_id: Optional[int],
+    ) -> None:
+        # hand coordinator msg to the election thread (newest replaces unread)
+        self._drain_coordinator_queue()
+        try:
+            self._coord_q.put_nowait(msg)
+        except queue.Full:
+            pass
+
+        lead_id = int(msg.get("leader_id", -1))
+        e = int(msg.get("epoch", 1))
+        lead = LeaderInfo(
+            leader_id=lead_id,
+            leader_ip=src_ip,  # real sender IP
+            leader_tcp_port=int(msg.get("leader_tcp_port", 0)),
+            epoch=e,
+            last_seq=int(msg.get("last_seq", 0)),
+            last_seen_ts=now,
+        )
+
+        # If I'm leader but see a legitimate higher coordinator, step down.
+        # Bully rule: higher epoch wins; at same epoch, higher ID wins.
+        should_step_down = (
+            self.role == "leader"
+            and lead_id != self.node_id
+            and (e > self.epoch or (e == self.epoch and lead_id > self.node_id))
+        )
+        if should_step_down:
+            self.log(f"Stepping down: coordinator {lead_id} epoch={e}")
+            self._demote_to_follower(lead)
+
+        # As follower receiving COORDINATOR: reset TCP to reconnect to new leader
+        if self.role == "follower":
+            if self.leader is None or lead_id != self.leader.leader_id:
+                self._close_tcp_client()
+            self.leader = lead
+            self._observe_epoch(e)
+
+    def _on_udp_disc_readable(self, sock: socket.socket) -> None:
+        for data, (src_ip, src_port) in drain_udp(sock):
+            self._on_udp_disc_datagram(sock, data, src_ip, src_port)
+
+    def _on_udp_disc_datagram(
+        self, sock: socket.socket, data: bytes, src_ip: str, src_port: int
+    ) -> None:
+        try:
+            if self._disc_dups.is_duplicate(src_port, data):
+                return
+            msg = decode(data)
+            if msg.get("type") == "WHO_IS_LEADER" and self.role == "leader":
+                # Register the querying peer
+                sid = msg.get("sender_id")
+                stcp = msg.get("sender_tcp_port", 0)
+                if sid is not None:
+                    try:
+                        self._register_peer(int(sid), src_ip, int(stcp))
+                    except (ValueError, TypeError):
+                        pass
+
+                reply = i_am_leader(
+                    leader_id=self.node_id,
+                    leader_ip=local_ip_for_peer(src_ip),
+                    leader_tcp_port=self.tcp_port,
+                    epoch=self.epoch,
+                    last_seq=self.last_seq,
+                )
+                send_udp(sock, encode(reply), src_ip, src_port)
+        except OSError:
+            return  # socket closed (stop / demotion)
+        except Exception:
+            pass
+
     # ---------------- FOLLOWER DISCOVERY + TIMEOUT ----------------
 
     def _follower_discovery_loop(self) -> None:
         while not self.stop_event.is_set():
             if self.role != "follower":
-                time.sleep(0.5)
+                self.stop_event.wait(0.5)
                 continue
 
-            now = time.time()
+            now = time.monotonic()
 
             # leader timeout?
             if self.leader and (now - self.leader.last_seen_ts) > LEADER_TIMEOUT:
@@ -787,18 +1083,33 @@ class Node:
                 failed_id = self.leader.leader_id
                 with self.peers_lock:
                     self.peers.pop(failed_id, None)
+                    self._peer_last_seen.pop(failed_id, None)
+                    self._invalidate_peer_views()
                 self.leader = None
+                self._discovery_interval = DISCOVERY_INTERVAL_MIN
+                self._next_discovery_ts = 0.0
                 self._safe_start_election("Leader timeout")
 
-            # If leader unknown: ask via discovery port
-            if self.leader is None and not self.in_election:
+            # Missed heartbeat(s): NACK so the leader re-sends before LEADER_TIMEOUT
+            leader = self.leader
+            if (
+                HEARTBEAT_SEQ
+                and leader is not None
+                and (now - leader.last_seen_ts) > 1.5 * HEARTBEAT_INTERVAL
+            ):
+                self._send_to_node(
+                    leader.leader_id, heartbeat_nack(self.node_id, self._leader_hb_seq)
+                )
+
+            # If leader unknown: ask via discovery port (with backoff)
+            if (
+                self.leader is None
+                and not self.in_election
+                and now >= self._next_discovery_ts
+            ):
                 q = who_is_leader(self.node_id, self.tcp_port)
-                payload = encode(q)
-                for ip in discovery_targets():
-                    try:
-                        send_udp(self.udp_node, payload, ip, DISCOVERY_PORT)
-                    except Exception:
-                        pass
+                self._broadcast_to_discovery(q, DISCOVERY_PORT)
+                self._next_discovery_ts = now + self._next_discovery_delay()
 
             # If leader known but TCP not connected: connect
             if self.leader is not None:
@@ -807,7 +1118,18 @@ class Node:
             # Periodic peer pruning
             self._prune_peers()
 
-            time.sleep(DISCOVERY_INTERVAL)
+            self.stop_event.wait(DISCOVERY_INTERVAL)
+
+    def _next_discovery_delay(self) -> float:
+        """Delay before the next WHO_IS_LEADER: doubles while the peer set is
+        unchanged, resets to DISCOVERY_INTERVAL_MIN when it changes."""
+        peer_ids = frozenset(self._get_peer_ids())
+        if peer_ids != self._discovery_peer_ids:
+            self._discovery_peer_ids = peer_ids
+            self._discovery_interval = DISCOVERY_INTERVAL_MIN
+        delay = self._discovery_interval
+        self._discovery_interval = min(delay * 2, DISCOVERY_INTERVAL_MAX)
+        return delay
 
     # ---------------- TCP LEADER ----------------
 
@@ -816,19 +1138,23 @@ class Node:
             mtype = msg.get("type")
 
             if mtype == "NEW_ORDER":
+                # msg was just decoded and nothing else holds it: the order
+                # can own the payload dict as is (no copy)
+                payload = msg.get("payload", {})
+                if not isinstance(payload, dict):
+                    self.log("Malformed NEW_ORDER ignored (payload is not an object)")
+                    return
                 order_uuid = str(msg.get("order_uuid", ""))
                 # UUID Deduplication: prevent duplicate order processing
-                with self.seen_uuids_lock:
-                    if order_uuid and order_uuid in self.seen_order_uuids:
+                if order_uuid:
+                    with self.seen_uuids_lock:
+                        duplicate = self.seen_order_uuids.add(order_uuid)
+                    if duplicate:
                         self.log(f"Duplicate order ignored: {order_uuid}")
                         return
-                    if order_uuid:
-                        self.seen_order_uuids.add(order_uuid)
 
                 with self.history_lock:
-                    self.last_seq = max(
-                        self.last_seq, max(self.history.keys(), default=0)
-                    )
+                    self.last_seq = max(self.last_seq, self.history.max_seq)
                     self.last_seq += 1
                     seq = self.last_seq
                     om = order_msg(
@@ -836,71 +1162,89 @@ class Node:
                         epoch=self.epoch,
                         seq=seq,
                         order_uuid=order_uuid,
-                        payload=dict(msg.get("payload", {})),
+                        payload=payload,
                     )
                     om["sender_id"] = msg.get("sender_id")
                     self.history[seq] = om
-
-                # WAL: persist to disk BEFORE broadcasting (crash durability)
-                self._append_to_wal(om)
-
-                self._process_order(om)
-                assert self.tcp_server is not None
-                self.tcp_server.broadcast(om)
+                    # WAL: persist to disk BEFORE broadcasting (crash durability).
+                    # Asynchronous: this runs on the TCP server's event loop,
+                    # which must keep reading other followers meanwhile.
+                    self._publish_after_wal(om)
 
             elif mtype == "RESEND_REQUEST":
                 from_seq = int(msg.get("from_seq", 1))
                 with self.history_lock:
-                    hi = max(self.history.keys(), default=0)
-                    for s in range(from_seq, hi + 1):
-                        if s in self.history:
-                            conn.send(self.history[s])
+                    for om in self.history.range(from_seq, self.history.max_seq):
+                        conn.send_encoded(self._order_frame(om))
 
         self.tcp_server = TCPServer(
             "0.0.0.0", self.tcp_port, on_msg=on_msg, on_log=self.log
         )
         self.tcp_server.start()
 
-    def _start_leader_heartbeat_thread(self) -> None:
+    def _order_frame(self, om: Dict[str, Any]) -> bytes:
+        """TCP frame for a history entry, encoded once and then reused.
+
+        Caller holds history_lock.
+        """
+        seq = om["seq"]
+        cached = self._order_frames.get(seq)
+        # identity check: a history slot can be overwritten after a failover
+        if cached is None or cached[0] is not om:
+            cached = (om, encode_frame(om))
+            self._order_frames[seq] = cached
+        return cached[1]
+
+    def _start_leader_heartbeat(self) -> None:
         if self._heartbeat_started:
             return
         self._heartbeat_started = True
-        t = threading.Thread(target=self._leader_heartbeat_loop, daemon=True)
-        t.start()
-        self.threads.add(t)
+        # runs on the UDP event loop thread: building + sending never blocks
+        self.udp_loop.call_every(HEARTBEAT_INTERVAL, self._leader_heartbeat_tick)
 
-    def _leader_heartbeat_loop(self) -> None:
-        while not self.stop_event.is_set():
-            if self.role != "leader":
-                time.sleep(0.5)
-                continue
+    def _leader_heartbeat_tick(self) -> None:
+        if self.role != "leader":
+            return
 
-            with self.history_lock:
-                self.last_seq = max(self.last_seq, max(self.history.keys(), default=0))
-
-            # Build cluster peer list for heartbeat so followers learn about each other
-            cluster_list = []
-            with self.peers_lock:
-                for pid, pinfo in self.peers.items():
-                    cluster_list.append(
-                        {"id": pid, "ip": pinfo.ip, "tcp": pinfo.tcp_port}
-                    )
+        with self.history_lock:
+            self.last_seq = max(self.last_seq, self.history.max_seq)
 
+        # Build cluster peer list for heartbeat so followers learn about each other
+        # (rebuilt only after the registry changed)
+        with self.peers_lock:
+            cluster_list = self._hb_cluster
+            if cluster_list is None:
+                cluster_list = self._hb_cluster = [
+                    {"id": pid, "ip": pinfo.ip, "tcp": pinfo.tcp_port}
+                    for pid, pinfo in self.peers.items()
+                ]
+
+        self._hb_seq += 1
+        # Nothing but hb_seq changed since the last tick: patch the old bytes
+        state = (self.epoch, self.last_seq)
+        payload = None
+        tpl = self._hb_template
+        if tpl is not None and tpl[0] == state and tpl[1] is cluster_list:
+            payload = with_hb_seq(tpl[2], self._hb_seq)
+        if payload is None:
             hb = leader_alive(
                 self.node_id,
                 self.epoch,
                 self.last_seq,
                 self.tcp_port,
                 cluster=cluster_list,
+                hb_seq=self._hb_seq,
             )
+            payload = encode(hb)
+            self._hb_template = (state, cluster_list, payload)
+        # Omission Fault Tolerance: kept for HEARTBEAT_NACK re-sends
+        self._last_heartbeat = payload
 
-            # Omission Fault Tolerance: send heartbeat multiple times
-            # This reduces the chance of election due to dropped UDP packets
-            for _ in range(HEARTBEAT_REDUNDANCY):
-                # Send to all known peers directly
-                self._broadcast_to_all_peers(hb)
-
-            time.sleep(HEARTBEAT_INTERVAL)
+        # Send to all known peers directly
+        try:
+            self._send_payload_to_peers(payload)
+        except Exception as e:
+            self.log(f"Heartbeat send error: {e}")
 
     # ---------------- TCP FOLLOWER ----------------
 
@@ -951,7 +1295,8 @@ class Node:
         payload = msg.get("payload", {})
         text = payload.get("text", str(payload))
         sender = msg.get("sender_id", "unknown")
-        self.log(f"DELIVER seq={msg.get('seq')} [from={sender}] | {text}")
+        # the kitchen's only output: never dropped, even when stdout lags
+        self.log(f"DELIVER seq={msg.get('seq')} [from={sender}] | {text}", keep=True)
 
     # ---------------- WAITER INPUT ----------------
 
@@ -970,18 +1315,16 @@ class Node:
     def submit_order(self, payload: Dict[str, Any]) -> None:
         # If I'm leader, accept local orders (demo-friendly)
         if self.role == "leader":
-            oid = str(uuid.uuid4())
+            oid = secrets.token_hex(16)
             with self.history_lock:
-                self.last_seq = max(self.last_seq, max(self.history.keys(), default=0))
+                self.last_seq = max(self.last_seq, self.history.max_seq)
                 self.last_seq += 1
                 seq = self.last_seq
                 om = order_msg(self.node_id, self.epoch, seq, oid, payload)
                 om["sender_id"] = self.node_id
                 self.history[seq] = om
+                self._publish_after_wal(om)
             self.log(f"LOCAL_ORDER -> seq={seq} (broadcast ORDER)")
-            self._process_order(om)
-            if self.tcp_server:
-                self.tcp_server.broadcast(om)
             return
 
         if not self.tcp_client:
@@ -992,7 +1335,8 @@ class Node:
                 self.log("Cannot submit order: not connected to leader yet")
                 return
 
-        oid = str(uuid.uuid4())
+        # 128 random bits as 32 hex chars: one urandom read, no UUID object
+        oid = secrets.token_hex(16)
         self.tcp_client.send(new_order(self.node_id, oid, payload))
         self.log(f"Sent NEW_ORDER uuid={oid}")
 
@@ -1001,8 +1345,7 @@ class Node:
     def _bully_election(self) -> None:
         # IMPORTANT: no extra guard here (starter already guarded)
         self.answer_event.clear()
-        self.coordinator_event.clear()
-        self.coordinator_msg = None
+        self._drain_coordinator_queue()
 
         # Clean up any stale peers before computing 'higher' set
         self._prune_peers()
@@ -1012,11 +1355,11 @@ class Node:
         higher = [pid for pid in self._get_peer_ids() if pid > self.node_id]
         self.log(f"Election started. higher={higher}")
 
+        # same message for every higher peer: encode it once
+        payload = encode(election(self.node_id, proposed_epoch, self.tcp_port))
         for nid in higher:
             try:
-                self._send_to_node(
-                    nid, election(self.node_id, proposed_epoch, self.tcp_port)
-                )
+                self._send_payload_to_node(nid, payload)
             except Exception:
                 pass
 
@@ -1035,25 +1378,24 @@ class Node:
             return
 
         self.log("Got ANSWER -> waiting for COORDINATOR")
-        got_coord = self.coordinator_event.wait(COORDINATOR_TIMEOUT)
-
-        if not got_coord or not self.coordinator_msg:
+        try:
+            msg = self._coord_q.get(timeout=COORDINATOR_TIMEOUT)
+        except queue.Empty:
             self.log("Coordinator timeout -> retry election")
             with self.election_lock:
                 self.in_election = False
                 self.in_election_since = 0.0
             return
 
-        msg = self.coordinator_msg
         lead = LeaderInfo(
             leader_id=int(msg["leader_id"]),
             leader_ip=str(msg.get("leader_ip", "")) or "127.0.0.1",
             leader_tcp_port=int(msg.get("leader_tcp_port", 0)),
             epoch=int(msg.get("epoch", proposed_epoch)),
             last_seq=int(msg.get("last_seq", 0)),
-            last_seen_ts=time.time(),
+            last_seen_ts=time.monotonic(),
         )
-        self.epoch = max(self.epoch, lead.epoch)
+        self._observe_epoch(lead.epoch)
         self.leader = lead
         self.log(
             f"COORDINATOR is {lead.leader_id} @ {lead.leader_ip}:{lead.leader_tcp_port} epoch={lead.epoch}"
@@ -1065,18 +1407,29 @@ class Node:
 
         self._ensure_tcp_connected()
 
+    def _drain_coordinator_queue(self) -> None:
+        while True:
+            try:
+                self._coord_q.get_nowait()
+            except queue.Empty:
+                return
+
+    def _observe_epoch(self, epoch: int) -> None:
+        with self.epoch_lock:
+            if epoch > self.epoch:
+                self.epoch = epoch
+
     def _promote_to_leader(self, new_epoch: int) -> None:
         self._close_tcp_client()
         self.role = "leader"
         self.leader = None
-        self.epoch = max(self.epoch + 1, new_epoch)
+        with self.epoch_lock:
+            self.epoch = max(self.epoch + 1, new_epoch)
 
         if self.udp_disc is None:
             try:
-                self.udp_disc = make_udp_socket(DISCOVERY_PORT)
-                t = threading.Thread(target=self._udp_disc_listener, daemon=True)
-                t.start()
-                self.threads.add(t)
+                self.udp_disc = self._make_disc_socket()
+                self.udp_loop.register(self.udp_disc, self._on_udp_disc_readable)
             except Exception as e:
                 self.log(f"Failed to bind discovery port: {e}")
 
@@ -1084,14 +1437,16 @@ class Node:
             self._start_tcp_leader()
 
         # start periodic heartbeat AFTER promotion
-        self._start_leader_heartbeat_thread()
+        self._start_leader_heartbeat()
 
         with self.history_lock:
-            self.last_seq = max(self.last_seq, max(self.history.keys(), default=0))
+            self.last_seq = max(self.last_seq, self.history.max_seq)
             # Update the next expected sequence number so that new orders can be delivered.
             with self.delivery_lock:
                 self.expected_seq = max(self.expected_seq, self.last_seq + 1)
-                self.delivered_seqs.update(range(1, self.expected_seq))
+                # buffered orders we just skipped past would never be popped
+                for stale in [q for q in self.buffer if q < self.expected_seq]:
+                    del self.buffer[stale]
 
         coord_msg = coordinator(
             self.node_id, primary_ip(), self.tcp_port, self.epoch, self.last_seq
@@ -1113,6 +1468,7 @@ class Node:
 
         # Release the discovery port so the new leader can bind it
         if self.udp_disc:
+            self.udp_loop.unregister(self.udp_disc)
             try:
                 self.udp_disc.close()
             except Exception:
@@ -1141,3 +1497,7 @@ class Node:
             self.tcp_client.close()
         if self.tcp_server:
             self.tcp_server.stop()
+        self._wal_publisher.shutdown(wait=False)
+        if self._wal_writer:
+            self._wal_writer.close()
+        flush_log()
@@ -1,15 +1,113 @@
 import json
-from typing import Any, Dict
+import socket
+import struct
+from typing import Any, Dict, Optional
+
+try:  # optional C codec: parses several times faster, so listeners hold the GIL less
+    import orjson
+except ImportError:
+    orjson = None
+
+# Built once: json.dumps() with non-default options constructs a new encoder per call
+_JSON = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
 
 
 def encode(msg: Dict[str, Any]) -> bytes:
-    return json.dumps(msg, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if msg.get("type") == "LEADER_ALIVE":
+        try:
+            return _encode_leader_alive(msg)
+        except (struct.error, OSError, KeyError, TypeError, ValueError):
+            pass  # out-of-range field / non-IPv4 peer: plain JSON still works
+    if orjson is not None:
+        try:
+            return orjson.dumps(msg)
+        except TypeError:
+            pass  # non-str keys or >64-bit ints: the json module copes
+    return _JSON.encode(msg).encode("utf-8")
 
 
 def decode(data: bytes) -> Dict[str, Any]:
+    if data[:1] == _BIN_MAGIC:
+        return _decode_leader_alive(data)
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            pass  # e.g. invalid UTF-8: fall through to the lenient decode
     return json.loads(data.decode("utf-8", errors="replace"))
 
 
+# ---------------- Binary heartbeat ----------------
+# LEADER_ALIVE is the highest-rate message and has a fixed schema, so it is
+# packed with struct instead of JSON. The first byte can't start a JSON object.
+#   header: magic, kind, leader_id, epoch, last_seq, leader_tcp_port, hb_seq, n
+#   then n cluster entries: id, IPv4, tcp port
+
+_BIN_MAGIC = b"\xca"
+_KIND_LEADER_ALIVE = 1
+_LEADER_ALIVE_HDR = struct.Struct("!cBIQQHQH")
+_CLUSTER_ENTRY = struct.Struct("!I4sH")
+_HB_SEQ = struct.Struct("!Q")
+_HB_SEQ_OFFSET = struct.calcsize("!cBIQQH")
+
+
+def _encode_leader_alive(msg: Dict[str, Any]) -> bytes:
+    cluster = msg.get("cluster") or []
+    parts = [
+        _LEADER_ALIVE_HDR.pack(
+            _BIN_MAGIC,
+            _KIND_LEADER_ALIVE,
+            msg["leader_id"],
+            msg["epoch"],
+            msg["last_seq"],
+            msg["leader_tcp_port"],
+            msg.get("hb_seq", 0),
+            len(cluster),
+        )
+    ]
+    for p in cluster:
+        parts.append(_CLUSTER_ENTRY.pack(p["id"], socket.inet_aton(p["ip"]), p["tcp"]))
+    return b"".join(parts)
+
+
+def with_hb_seq(data: bytes, hb_seq: int) -> Optional[bytes]:
+    """Copy of an encoded binary LEADER_ALIVE with hb_seq replaced.
+
+    Lets the leader re-send an unchanged heartbeat without re-encoding the
+    cluster list. None if data is the JSON fallback form.
+    """
+    if data[:1] != _BIN_MAGIC:
+        return None
+    buf = bytearray(data)
+    _HB_SEQ.pack_into(buf, _HB_SEQ_OFFSET, hb_seq)
+    return bytes(buf)
+
+
+def _decode_leader_alive(data: bytes) -> Dict[str, Any]:
+    _, kind, lid, epoch, last_seq, ltcp, hb_seq, n = _LEADER_ALIVE_HDR.unpack_from(
+        data, 0
+    )
+    if kind != _KIND_LEADER_ALIVE:
+        raise ValueError(f"unknown binary message kind {kind}")
+    msg = {
+        "type": "LEADER_ALIVE",
+        "leader_id": lid,
+        "epoch": epoch,
+        "last_seq": last_seq,
+        "leader_tcp_port": ltcp,
+        "hb_seq": hb_seq,
+    }
+    if n:
+        off = _LEADER_ALIVE_HDR.size
+        cluster = []
+        for _ in range(n):
+            pid, pip, ptcp = _CLUSTER_ENTRY.unpack_from(data, off)
+            cluster.append({"id": pid, "ip": socket.inet_ntoa(pip), "tcp": ptcp})
+            off += _CLUSTER_ENTRY.size
+        msg["cluster"] = cluster
+    return msg
+
+
 # ---------------- UDP discovery/heartbeat ----------------
 
 
@@ -40,6 +138,7 @@ def leader_alive(
     last_seq: int,
     leader_tcp_port: int,
     cluster: list = None,
+    hb_seq: int = 0,
 ) -> Dict[str, Any]:
     msg = {
         "type": "LEADER_ALIVE",
@@ -47,12 +146,21 @@ def leader_alive(
         "epoch": epoch,
         "last_seq": last_seq,
         "leader_tcp_port": leader_tcp_port,
+        "hb_seq": hb_seq,
     }
     if cluster:
         msg["cluster"] = cluster
     return msg
 
 
+def heartbeat_nack(sender_id: int, last_hb_seq: int) -> Dict[str, Any]:
+    return {
+        "type": "HEARTBEAT_NACK",
+        "sender_id": sender_id,
+        "last_hb_seq": last_hb_seq,
+    }
+
+
 # ---------------- UDP election (Bully) ----------------
 
 
@@ -0,0 +1,78 @@
+import itertools
+from typing import Any, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+Msg = TypeVar("Msg", bound=Any)
+
+# How far past max_seq a new seq may land; anything further is a corrupt
+# record or a bad peer, and growing the list to it could take gigabytes.
+MAX_GAP = 1 << 20
+
+
+class SeqLog(Generic[Msg]):
+    """
+    Order history indexed by seq (1..N), backed by a list.
+
+    Sequence numbers are dense, so one list slot per seq is smaller than a
+    dict entry and lookups don't hash. Seqs not received yet (a gap waiting
+    for a resend) hold None. Supports the subset of the dict API that Node
+    and the tests use (item access, get, in, len, keys/values/items).
+    Values are usually order dicts but can be anything except None.
+    A seq more than MAX_GAP beyond max_seq is rejected with KeyError.
+    """
+
+    __slots__ = ("_slots", "_count")
+
+    def __init__(self):
+        self._slots: List[Optional[Msg]] = [None]  # seq 0 is never used
+        self._count = 0
+
+    def __setitem__(self, seq: int, msg: Msg) -> None:
+        n = len(self._slots)
+        if seq <= 0 or seq - n >= MAX_GAP:
+            raise KeyError(seq)
+        if seq >= n:
+            self._slots.extend([None] * (seq + 1 - n))
+        if self._slots[seq] is None:
+            self._count += 1
+        self._slots[seq] = msg
+
+    def __getitem__(self, seq: int) -> Msg:
+        msg = self.get(seq)
+        if msg is None:
+            raise KeyError(seq)
+        return msg
+
+    def get(self, seq: int, default: Optional[Msg] = None) -> Optional[Msg]:
+        if 0 < seq < len(self._slots):
+            msg = self._slots[seq]
+            if msg is not None:
+                return msg
+        return default
+
+    def __contains__(self, seq: object) -> bool:
+        return isinstance(seq, int) and self.get(seq) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def max_seq(self) -> int:
+        """Highest stored seq (0 when empty); O(1), unlike max(keys())."""
+        return len(self._slots) - 1
+
+    def range(self, lo: int, hi: int) -> Iterator[Msg]:
+        """Stored messages with lo <= seq <= hi, in seq order."""
+        window = itertools.islice(self._slots, max(lo, 1), max(hi + 1, 0))
+        return (m for m in window if m is not None)
+
+    def keys(self) -> Iterator[int]:
+        return (seq for seq, m in enumerate(self._slots) if m is not None)
+
+    def values(self) -> Iterator[Msg]:
+        return (m for m in self._slots if m is not None)
+
+    def items(self) -> Iterator[Tuple[int, Msg]]:
+        return ((seq, m) for seq, m in enumerate(self._slots) if m is not None)
+
+    def __repr__(self) -> str:
+        return f"SeqLog({dict(self.items())!r})"
@@ -2,7 +2,7 @@ import socket
 import threading
 from typing import Dict, Any, Callable, Optional
 
-from .tcp_stream import send_json_line, read_json_lines
+from .tcp_stream import send_frame, read_frames, tune_tcp
 
 
 class TCPClient:
@@ -22,6 +22,7 @@ class TCPClient:
             s.settimeout(timeout)
             s.connect((host, port))
             s.settimeout(None)
+            tune_tcp(s)
             self.sock = s
 
             self.reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
@@ -37,7 +38,7 @@ class TCPClient:
     def _reader_loop(self) -> None:
         assert self.sock is not None
         try:
-            read_json_lines(self.sock, self.on_msg)
+            read_frames(self.sock, self.on_msg)
         except Exception:
             pass
         finally:
@@ -48,7 +49,7 @@ class TCPClient:
         if not self.sock:
             return
         with self.lock:
-            send_json_line(self.sock, msg)
+            send_frame(self.sock, msg)
 
     def close(self) -> None:
         with self.lock:
@@ -1,19 +1,88 @@
+import functools
 import socket
 import threading
-from typing import Dict, Any, Callable, List, Optional
+from collections import deque
+from typing import Deque, Dict, Any, Callable, List, Optional
 
-from .tcp_stream import send_json_line, read_json_lines
+from .net import EventLoop
+from .proto import decode
+from .tcp_stream import FrameBuffer, encode_frame, tune_tcp
+
+# Unsent bytes allowed per client before it is disconnected as too slow
+MAX_PENDING_BYTES = 32 * 1024 * 1024
 
 
 class ClientConn:
-    def __init__(self, sock: socket.socket, addr):
+    """
+    One accepted follower connection (non-blocking socket).
+
+    Sends never block: a frame the kernel can't take right away is queued
+    in `pending` and flushed by the event loop when the socket is writable,
+    so one slow follower doesn't hold up a broadcast to the others.
+    """
+
+    def __init__(self, sock: socket.socket, addr, loop: EventLoop):
         self.sock = sock
         self.addr = addr
-        self.lock = threading.Lock()
+        self.loop = loop
+        self.lock = threading.Lock()  # guards pending; reads are loop-only
+        self.frames = FrameBuffer()
+        self.pending: Deque[memoryview] = deque()
+        self.pending_bytes = 0
 
     def send(self, msg: Dict[str, Any]) -> None:
+        self.send_encoded(encode_frame(msg))
+
+    def send_encoded(self, frame: bytes) -> None:
+        """
+        Send (or queue) a frame already built by encode_frame().
+
+        Raises ConnectionError once the backlog exceeds MAX_PENDING_BYTES;
+        the socket is shut down so the server's reader drops the client.
+        """
+        with self.lock:
+            if self.pending:
+                data = memoryview(frame)
+            else:
+                try:
+                    n = self.sock.send(frame)
+                except BlockingIOError:
+                    n = 0
+                if n == len(frame):
+                    return
+                data = memoryview(frame)[n:]
+            if self.pending_bytes + len(data) > MAX_PENDING_BYTES:
+                self._shutdown()
+                raise ConnectionError(f"send backlog to {self.addr} over limit")
+            if not self.pending:
+                self.loop.set_writer(self.sock, self._on_writable)
+            self.pending.append(data)
+            self.pending_bytes += len(data)
+
+    def _on_writable(self, sock: socket.socket) -> None:
         with self.lock:
-            send_json_line(self.sock, msg)
+            try:
+                while self.pending:
+                    head = self.pending[0]
+                    n = sock.send(head)
+                    self.pending_bytes -= n
+                    if n < len(head):
+                        self.pending[0] = head[n:]
+                        return  # kernel buffer full again: wait for the next event
+                    self.pending.popleft()
+            except BlockingIOError:
+                return
+            except OSError:
+                self._shutdown()
+                self.pending.clear()
+                self.pending_bytes = 0
+            self.loop.set_writer(sock, None)
+
+    def _shutdown(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # wakes the reader with EOF
+        except OSError:
+            pass
 
     def close(self) -> None:
         try:
@@ -23,6 +92,15 @@ class ClientConn:
 
 
 class TCPServer:
+    """
+    Leader-side TCP endpoint.
+
+    One EventLoop thread accepts connections and reads every client socket,
+    so the thread count doesn't grow with the number of followers. on_msg
+    runs on that thread and must not block for long. Sends (send/broadcast)
+    may come from any thread and don't block (see ClientConn).
+    """
+
     def __init__(
         self,
         host: str,
@@ -37,6 +115,7 @@ class TCPServer:
 
         self.sock: Optional[socket.socket] = None
         self.stop_event = threading.Event()
+        self.loop = EventLoop(on_error=on_log)
 
         self.clients: List[ClientConn] = []
         self.clients_lock = threading.Lock()
@@ -46,46 +125,68 @@ class TCPServer:
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.sock.bind((self.host, self.port))
         self.sock.listen(50)
+        self.sock.setblocking(False)
+        self.loop.register(self.sock, self._on_acceptable)
 
-        t = threading.Thread(target=self._accept_loop, daemon=True)
+        t = threading.Thread(target=self._run_loop, name="tcp-server", daemon=True)
         t.start()
         self.on_log(f"TCPServer listening on {self.host}:{self.port}")
 
-    def _accept_loop(self) -> None:
-        assert self.sock is not None
-        while not self.stop_event.is_set():
-            try:
-                c, addr = self.sock.accept()
-                conn = ClientConn(c, addr)
-                with self.clients_lock:
-                    self.clients.append(conn)
-                self.on_log(f"TCP client connected: {addr}")
-
-                rt = threading.Thread(
-                    target=self._client_reader, args=(conn,), daemon=True
-                )
-                rt.start()
-            except Exception:
-                continue
+    def _run_loop(self) -> None:
+        self.loop.run(self.stop_event)
+        self.loop.close()
 
-    def _client_reader(self, conn: ClientConn) -> None:
+    def _on_acceptable(self, sock: socket.socket) -> None:
         try:
-            read_json_lines(conn.sock, lambda m: self.on_msg(conn, m))
-        except Exception:
-            pass
-        finally:
-            with self.clients_lock:
-                if conn in self.clients:
-                    self.clients.remove(conn)
-            self.on_log(f"TCP client disconnected: {conn.addr}")
-            conn.close()
+            c, addr = sock.accept()
+        except OSError:
+            return
+        c.setblocking(False)
+        tune_tcp(c)
+        conn = ClientConn(c, addr, self.loop)
+        with self.clients_lock:
+            self.clients.append(conn)
+        self.loop.register(c, functools.partial(self._on_readable, conn))
+        self.on_log(f"TCP client connected: {addr}")
+
+    def _on_readable(self, conn: ClientConn, sock: socket.socket) -> None:
+        try:
+            n = conn.frames.recv_from(sock)
+        except BlockingIOError:
+            return  # spurious wakeup
+        except OSError:
+            n = 0
+        try:
+            for body in conn.frames.frames():
+                try:
+                    self.on_msg(conn, decode(body))
+                except Exception:
+                    continue
+        except ValueError:  # oversized frame
+            n = 0
+        if not n:
+            self._drop(conn)
+
+    def _drop(self, conn: ClientConn) -> None:
+        with self.clients_lock:
+            if conn not in self.clients:
+                return
+            self.clients.remove(conn)
+        self.loop.unregister(conn.sock)
+        self.on_log(f"TCP client disconnected: {conn.addr}")
+        conn.close()
 
     def broadcast(self, msg: Dict[str, Any]) -> None:
+        # encode once, not once per client
+        self.broadcast_frame(encode_frame(msg))
+
+    def broadcast_frame(self, frame: bytes) -> None:
+        """Queue a frame already built by encode_frame() to every client."""
         with self.clients_lock:
             targets = list(self.clients)
         for c in targets:
             try:
-                c.send(msg)
+                c.send_encoded(frame)
             except Exception:
                 pass
 
@@ -93,6 +194,7 @@ class TCPServer:
         self.stop_event.set()
         try:
             if self.sock:
+                self.loop.unregister(self.sock)
                 self.sock.close()
         except Exception:
             pass
@@ -100,4 +202,5 @@ class TCPServer:
             targets = list(self.clients)
             self.clients.clear()
         for c in targets:
+            self.loop.unregister(c.sock)
             c.close()
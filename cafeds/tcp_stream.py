@@ -1,34 +1,125 @@
-import json
 import socket
-from typing import Any, Dict, Callable
+import struct
+from typing import Any, Dict, Callable, Iterator
 
+from .proto import decode, encode
 
-def send_json_line(sock: socket.socket, msg: Dict[str, Any]) -> None:
-    data = json.dumps(msg, separators=(",", ":"), ensure_ascii=False) + "\n"
-    sock.sendall(data.encode("utf-8"))
+# Frame layout: <u32 body length, big-endian> <body>, body = proto.encode(msg).
+_LEN = struct.Struct(">I")
+MAX_FRAME = 16 * 1024 * 1024  # a larger length means a broken or foreign peer
+_RECV_BUF = 65536
 
+# keepalive: notice a silently dead peer after ~30 s (idle 15 s + 3 probes 5 s apart)
+_KEEPALIVE = (("TCP_KEEPIDLE", 15), ("TCP_KEEPINTVL", 5), ("TCP_KEEPCNT", 3))
 
-def read_json_lines(
-    sock: socket.socket, on_msg: Callable[[Dict[str, Any]], None]
-) -> None:
-    buffer = b""
-    while True:
+
+def tune_tcp(sock: socket.socket) -> None:
+    """Options for a connected node-to-node stream; best effort per option."""
+    try:
+        # frames are small and latency-bound: don't let Nagle hold them back
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    except OSError:
+        return
+    for name, value in _KEEPALIVE:
+        opt = getattr(socket, name, None)  # macOS lacks TCP_KEEPIDLE, Windows all
+        if opt is None:
+            continue
         try:
-            data = sock.recv(4096)
-            if not data:
+            sock.setsockopt(socket.IPPROTO_TCP, opt, value)
+        except OSError:
+            pass
+
+
+def encode_frame(msg: Dict[str, Any]) -> bytes:
+    body = encode(msg)
+    return _LEN.pack(len(body)) + body
+
+
+def send_frame(sock: socket.socket, msg: Dict[str, Any]) -> None:
+    sock.sendall(encode_frame(msg))
+
+
+class FrameBuffer:
+    """
+    Receive buffer and frame parser for one stream.
+
+    Bytes are received straight into one reusable bytearray; `head`..`tail`
+    is the unparsed part. The buffer grows only for a frame that doesn't fit.
+    """
+
+    __slots__ = ("_buf", "_view", "_head", "_tail")
+
+    def __init__(self, size: int = _RECV_BUF):
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._head = self._tail = 0
+
+    def recv_from(self, sock: socket.socket) -> int:
+        """One recv_into() at the tail of the buffer; 0 means EOF."""
+        if self._tail == len(self._buf):
+            self._make_room()
+        n = sock.recv_into(self._view[self._tail :])
+        self._tail += n
+        return n
+
+    def frames(self) -> Iterator[bytes]:
+        """
+        Yield the body of every complete frame received so far.
+
+        Raises ValueError on a length above MAX_FRAME (the stream can't be
+        resynchronised after that).
+        """
+        buf = self._buf
+        while self._tail - self._head >= _LEN.size:
+            (size,) = _LEN.unpack_from(buf, self._head)
+            if size > MAX_FRAME:
+                raise ValueError(f"frame of {size} bytes exceeds MAX_FRAME")
+            start = self._head + _LEN.size
+            if self._tail - start < size:
                 break
-            buffer += data
-            while b"\n" in buffer:
-                line, buffer = buffer.split(b"\n", 1)
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    msg = json.loads(line.decode("utf-8"))
-                    on_msg(msg)
-                except Exception:
-                    continue
+            self._head = start + size
+            yield bytes(self._view[start : self._head])
+        if self._head == self._tail:
+            self._head = self._tail = 0
+
+    def _make_room(self) -> None:
+        head, tail = self._head, self._tail
+        need = _LEN.size
+        if tail - head >= _LEN.size:
+            need += _LEN.unpack_from(self._buf, head)[0]
+        if need > len(self._buf):
+            # frame larger than the buffer: grow it (resizing needs the view gone)
+            self._view.release()
+            self._buf = self._buf[head:tail] + bytearray(need - (tail - head))
+            self._view = memoryview(self._buf)
+        else:
+            self._buf[: tail - head] = self._buf[head:tail]
+        self._tail = tail - head
+        self._head = 0
+
+
+def read_frames(sock: socket.socket, on_msg: Callable[[Dict[str, Any]], None]) -> None:
+    """
+    Call on_msg for every frame received on sock until it closes.
+
+    Undecodable frames are skipped, an oversized length ends the stream.
+    """
+    frames = FrameBuffer()
+    while True:
+        try:
+            n = frames.recv_from(sock)
         except socket.timeout:
             continue
         except Exception:
             break
+        if not n:
+            break
+        try:
+            for body in frames.frames():
+                try:
+                    on_msg(decode(body))
+                except Exception:
+                    continue
+        except ValueError:
+            return
@@ -1,21 +1,232 @@
+import ctypes
 import socket
-from typing import Tuple
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, Sequence, Tuple
 
+# Room for bursts (heartbeat re-sends + discovery) while the event loop is busy;
+# the kernel caps these at net.core.rmem_max / wmem_max.
+UDP_RCVBUF = 4 << 20
+UDP_SNDBUF = 1 << 20
+# <linux/in.h>; the socket module only exports these from Python 3.12
+_IP_MTU_DISCOVER = getattr(socket, "IP_MTU_DISCOVER", 10)
+_IP_PMTUDISC_DONT = getattr(socket, "IP_PMTUDISC_DONT", 0)
 
-def make_udp_socket(port: int, reuse_addr: bool = True) -> socket.socket:
+
+def make_udp_socket(
+    port: int, reuse_addr: bool = True, broadcast: bool = True, host: str = ""
+) -> socket.socket:
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     if reuse_addr:
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    # broadcast enable (needed for 255.255.255.255)
-    s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    s.bind(("", port))
-    s.settimeout(0.5)
+    if broadcast:
+        # broadcast enable (needed for 255.255.255.255)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    _tune_buffers(s)
+    s.bind((host, port))
+    # reads are driven by select()/EventLoop readiness, see drain_udp()
+    s.setblocking(False)
     return s
 
 
+def _tune_buffers(s: socket.socket) -> None:
+    for opt, size in ((socket.SO_RCVBUF, UDP_RCVBUF), (socket.SO_SNDBUF, UDP_SNDBUF)):
+        try:
+            s.setsockopt(socket.SOL_SOCKET, opt, size)
+        except OSError:
+            pass  # best effort: keep the default size
+    # Linux: never set DF, so a PMTU black hole can't swallow our datagrams
+    if sys.platform.startswith("linux"):
+        try:
+            s.setsockopt(socket.IPPROTO_IP, _IP_MTU_DISCOVER, _IP_PMTUDISC_DONT)
+        except OSError:
+            pass
+
+
+def enable_multicast_send(sock: socket.socket, ttl: int, iface_ip: str) -> None:
+    """Send multicast from iface_ip with a hop limit of ttl."""
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, struct.pack("b", ttl))
+    sock.setsockopt(
+        socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(iface_ip)
+    )
+
+
+def join_multicast(sock: socket.socket, group: str, iface_ip: str = "0.0.0.0") -> None:
+    """Receive datagrams sent to group on iface_ip (0.0.0.0: kernel's choice)."""
+    mreq = struct.pack("=4s4s", socket.inet_aton(group), socket.inet_aton(iface_ip))
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+
+
 def send_udp(sock: socket.socket, payload: bytes, ip: str, port: int) -> None:
     sock.sendto(payload, (ip, port))
 
 
 def recv_udp(sock: socket.socket) -> Tuple[bytes, Tuple[str, int]]:
     return sock.recvfrom(65535)
+
+
+def drain_udp(
+    sock: socket.socket, limit: int = 64
+) -> Iterator[Tuple[bytes, Tuple[str, int]]]:
+    """
+    Yield the datagrams already queued on a non-blocking socket.
+
+    An empty queue ends the loop (BlockingIOError) instead of waiting; `limit`
+    keeps one busy socket from starving the others in the event loop.
+    """
+    for _ in range(limit):
+        try:
+            yield sock.recvfrom(65535)
+        except OSError:  # BlockingIOError = queue empty; otherwise socket closed
+            return
+
+
+class RecentDatagrams:
+    """
+    Detects an identical datagram seen again within `window` seconds.
+
+    Multi-homed hosts (and single-PC mode) receive one copy of a broadcast per
+    matching discovery target; only the first copy should be processed.
+    Not thread-safe: keep one instance per receive path.
+
+    Entries are kept oldest first, so expiry only ever looks at the front;
+    at most `max_entries` are remembered (the oldest go first in a burst).
+    """
+
+    def __init__(self, window: float, max_entries: int = 1024):
+        self.window = window
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[Tuple[int, bytes], float]" = OrderedDict()
+
+    def is_duplicate(self, src_port: int, data: bytes) -> bool:
+        now = time.monotonic()
+        seen = self._seen
+        while seen:
+            key, first = next(iter(seen.items()))
+            if now - first < self.window:
+                break
+            del seen[key]
+        key = (src_port, data)
+        if key in seen:
+            return True  # still inside the window: expired ones are gone
+        seen[key] = now
+        if len(seen) > self.max_entries:
+            seen.popitem(last=False)
+        return False
+
+
+# ---------------- Batched send (Linux sendmmsg) ----------------
+
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_Iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _Msghdr), ("msg_len", ctypes.c_uint)]
+
+
+class _SockaddrIn(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),  # network byte order
+        ("sin_addr", ctypes.c_uint32),  # network byte order
+        ("sin_zero", ctypes.c_uint8 * 8),
+    ]
+
+
+def _load_sendmmsg():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        fn = ctypes.CDLL(None, use_errno=True).sendmmsg
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.POINTER(_Mmsghdr), ctypes.c_uint, ctypes.c_int]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_sendmmsg = _load_sendmmsg()
+
+
+class _MmsgBatch:
+    """Pre-built mmsghdr array for a fixed destination list; only the payload changes."""
+
+    def __init__(self, addrs: Sequence[Tuple[str, int]]):
+        n = len(addrs)
+        self.lock = threading.Lock()
+        self.iov = _Iovec()
+        self.names = (_SockaddrIn * n)()
+        self.msgs = (_Mmsghdr * n)()
+        for i, (ip, port) in enumerate(addrs):
+            sa = self.names[i]
+            sa.sin_family = socket.AF_INET
+            sa.sin_port = socket.htons(port)
+            (sa.sin_addr,) = struct.unpack("=I", socket.inet_aton(ip))
+            hdr = self.msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(sa)
+            hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+            hdr.msg_iov = ctypes.pointer(self.iov)
+            hdr.msg_iovlen = 1
+
+
+_BATCH_CACHE: Dict[Tuple[Tuple[str, int], ...], _MmsgBatch] = {}
+_BATCH_CACHE_MAX = 32
+
+
+def _batch_for(addrs: Tuple[Tuple[str, int], ...]) -> _MmsgBatch:
+    batch = _BATCH_CACHE.get(addrs)
+    if batch is None:
+        if len(_BATCH_CACHE) >= _BATCH_CACHE_MAX:
+            _BATCH_CACHE.clear()
+        batch = _BATCH_CACHE[addrs] = _MmsgBatch(addrs)
+    return batch
+
+
+def send_many(
+    sock: socket.socket, payload: bytes, addrs: Sequence[Tuple[str, int]]
+) -> int:
+    """
+    Send the same datagram to every (ip, port) in addrs.
+
+    On Linux all datagrams go out in one sendmmsg() syscall; elsewhere (or for
+    anything sendmmsg didn't send) it falls back to one sendto() per target.
+    Per-target errors are swallowed like the sendto loops elsewhere; returns
+    the number of targets that failed with OSError.
+    """
+    addrs = tuple(addrs)
+    sent = 0
+    if _sendmmsg is not None and addrs:
+        try:
+            batch = _batch_for(addrs)
+            buf = ctypes.c_char_p(payload)
+            with batch.lock:
+                batch.iov.iov_base = ctypes.cast(buf, ctypes.c_void_p)
+                batch.iov.iov_len = len(payload)
+                sent = max(0, _sendmmsg(sock.fileno(), batch.msgs, len(addrs), 0))
+        except (OSError, ValueError):
+            sent = 0  # e.g. non-dotted host or closed socket: use the slow path
+
+    failed = 0
+    for addr in addrs[sent:]:
+        try:
+            sock.sendto(payload, addr)
+        except OSError:
+            failed += 1
+    return failed
@@ -0,0 +1,251 @@
+import contextlib
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+try:  # optional: several times faster WAL encode and replay
+    import orjson
+    from orjson import loads as _loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+# fallback: compact ASCII records; one encoder instance instead of one per json.dumps call
+_JSON = json.JSONEncoder(separators=(",", ":"))
+
+# Binary record layout: <u32 length> <JSON body> <u32 crc32(body)>, little-endian.
+_U32 = struct.Struct("<I")
+
+# bytes, or a read-only mmap of the WAL file (both support find/slicing/unpack_from)
+Buffer = Union[bytes, mmap.mmap]
+
+
+def _dumps(order: Dict[str, Any], newline: bool) -> bytes:
+    if orjson is not None:
+        try:
+            # orjson appends the newline itself: no second bytes object
+            option = orjson.OPT_APPEND_NEWLINE if newline else 0
+            return orjson.dumps(order, option=option)
+        except TypeError:
+            pass  # non-str keys / >64-bit ints
+    body = _JSON.encode(order).encode("utf-8")
+    return body + b"\n" if newline else body
+
+
+def encode_record(order: Dict[str, Any], fmt: str) -> bytes:
+    if fmt == "binary":
+        body = _dumps(order, newline=False)
+        return b"".join((_U32.pack(len(body)), body, _U32.pack(zlib.crc32(body))))
+    return _dumps(order, newline=True)
+
+
+@contextlib.contextmanager
+def open_for_replay(path: str, use_mmap: bool) -> Iterator[Buffer]:
+    """
+    Expose the whole WAL file as one buffer for recovery.
+
+    With use_mmap the file is mapped read-only and the kernel is told we read
+    it front to back (MADV_SEQUENTIAL), so no copy into Python memory is made.
+    """
+    with open(path, "rb") as f:
+        if not use_mmap:
+            yield f.read()
+            return
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b""  # empty file can't be mapped
+            return
+        try:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield mm
+        finally:
+            mm.close()
+
+
+def iter_records(
+    data: Buffer, fmt: str, end: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """Yield decoded WAL records from data[:end]; unreadable records are skipped."""
+    if end is None:
+        end = len(data)
+    if fmt == "binary":
+        yield from _iter_binary(data, end)
+        return
+    off = 0
+    while off < end:
+        nl = data.find(b"\n", off, end)
+        if nl == -1:
+            nl = end
+        line = data[off:nl]
+        off = nl + 1
+        if not line:
+            continue
+        try:
+            yield _loads(line)
+        except Exception:
+            continue
+
+
+def _iter_binary_frames(data: Buffer, end: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (end_offset, body) for each intact frame, stopping at the first bad one."""
+    off = 0
+    while off + _U32.size <= end:
+        (n,) = _U32.unpack_from(data, off)
+        body_end = off + _U32.size + n
+        if body_end + _U32.size > end:
+            return  # torn tail write (crash mid-append)
+        body = data[off + _U32.size : body_end]
+        (crc,) = _U32.unpack_from(data, body_end)
+        if zlib.crc32(body) != crc:
+            return  # corrupt record: lengths after it can't be trusted
+        off = body_end + _U32.size
+        yield off, body
+
+
+def _iter_binary(data: Buffer, end: int) -> Iterator[Dict[str, Any]]:
+    for _, body in _iter_binary_frames(data, end):
+        try:
+            yield _loads(body)
+        except Exception:
+            continue
+
+
+def valid_length(data: Buffer, fmt: str) -> int:
+    """Length of the intact prefix of a WAL (binary format can have a torn tail)."""
+    if fmt != "binary":
+        return len(data)
+    good = 0
+    for good, _ in _iter_binary_frames(data, len(data)):
+        pass
+    return good
+
+
+_fdatasync = getattr(os, "fdatasync", os.fsync)  # macOS/Windows: no fdatasync
+_writev = getattr(os, "writev", None)  # POSIX only
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+
+
+class WalWriter:
+    """
+    Group-commit appender for one WAL file.
+
+    append() blocks until its record is durable (submit() returns a Future
+    instead), but every record queued
+    while the writer thread is syncing goes out in the same write() and
+    shares one fdatasync(). Records are handed to writev() as-is (gather
+    write, no join copy). sync_interval (seconds) waits a little after the
+    first record of a batch when more are already queued, so that bursts
+    coalesce; a single record is written at once.
+
+    With dsync=True the file is opened O_DSYNC: each write() is durable when
+    it returns and no separate fdatasync() is issued. Falls back to
+    fdatasync where O_DSYNC doesn't exist.
+    """
+
+    def __init__(self, path: str, sync_interval: float = 0.0, dsync: bool = False):
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+        flags |= getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_BINARY", 0)
+        self._dsync = dsync and hasattr(os, "O_DSYNC")
+        if self._dsync:
+            flags |= os.O_DSYNC
+        self._fd = os.open(path, flags, 0o644)
+        self._sync_interval = sync_interval
+        # SimpleQueue: C implementation, no task_done() bookkeeping per record
+        self._q: "queue.SimpleQueue[Optional[Tuple[bytes, Future]]]" = (
+            queue.SimpleQueue()
+        )
+        self._closed = False
+        self._close_lock = threading.Lock()  # no submit() slips in behind close()
+        self._thread = threading.Thread(
+            target=self._run, name="wal-writer", daemon=True
+        )
+        self._thread.start()
+
+    def append(self, record: bytes) -> None:
+        """Queue record and wait until it is on disk (re-raises write errors)."""
+        self.submit(record).result()
+
+    def submit(self, record: bytes) -> Future:
+        """Queue record; the returned Future completes once it is on disk."""
+        done: Future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise ValueError("WAL writer is closed")
+            self._q.put((record, done))
+        return done
+
+    def close(self) -> None:
+        """Flush whatever is queued, stop the writer thread and close the file."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._q.put(None)  # last item: every submit() happened before this
+        self._thread.join()
+        os.close(self._fd)
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            # wait for stragglers only under load: a lone submitter (the
+            # follower's append() under delivery_lock) gets no extra latency
+            if first is not None and self._sync_interval > 0 and not self._q.empty():
+                time.sleep(self._sync_interval)
+            batch: List[Tuple[bytes, Future]] = []
+            stop = first is None
+            if first is not None:
+                batch.append(first)
+            while True:
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: List[Tuple[bytes, Future]]) -> None:
+        try:
+            self._write_all([rec for rec, _ in batch])
+            if not self._dsync:
+                _fdatasync(self._fd)
+        except BaseException as e:  # anything: never leave a Future pending
+            for _, done in batch:
+                done.set_exception(e)
+            return
+        for _, done in batch:
+            done.set_result(None)
+
+    def _write_all(self, records: List[bytes]) -> None:
+        if _writev is None:
+            data = memoryview(b"".join(records))
+            while data:
+                data = data[os.write(self._fd, data) :]
+            return
+        bufs = [memoryview(r) for r in records]
+        i = 0
+        while i < len(bufs):
+            n = _writev(self._fd, bufs[i : i + _IOV_MAX])
+            # skip fully written buffers, resume a short write mid-buffer
+            while i < len(bufs) and n >= len(bufs[i]):
+                n -= len(bufs[i])
+                i += 1
+            if n:
+                bufs[i] = bufs[i][n:]
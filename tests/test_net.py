@@ -0,0 +1,45 @@
+import threading
+
+from cafeds.net import EventLoop
+
+
+def test_event_loop_runs_periodic_timers():
+    loop = EventLoop()
+    stop = threading.Event()
+    ticks = []
+
+    def tick():
+        ticks.append(1)
+        if len(ticks) == 3:
+            stop.set()
+
+    loop.call_every(0.01, tick)
+    t = threading.Thread(target=loop.run, args=(stop,), daemon=True)
+    t.start()
+    t.join(timeout=2.0)
+    loop.close()
+    assert len(ticks) == 3
+
+
+def test_event_loop_survives_failing_callback():
+    errors = []
+    loop = EventLoop(on_error=errors.append)
+    stop = threading.Event()
+    ticks = []
+
+    def bad():
+        raise RuntimeError("boom")
+
+    def tick():
+        ticks.append(1)
+        if len(ticks) == 3:
+            stop.set()
+
+    loop.call_every(0.01, bad)
+    loop.call_every(0.01, tick)
+    t = threading.Thread(target=loop.run, args=(stop,), daemon=True)
+    t.start()
+    t.join(timeout=2.0)
+    loop.close()
+    assert len(ticks) == 3
+    assert errors and "boom" in errors[0]
@@ -0,0 +1,21 @@
+import uuid
+
+from cafeds.node import RecentIds
+
+
+def test_recent_ids_evicts_oldest():
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    seen = RecentIds(capacity=2)
+    assert seen.add(ids[0]) is False
+    assert seen.add(ids[0]) is True
+    seen.update(ids[1:])
+    assert len(seen) == 2
+    assert ids[0] not in seen
+    assert ids[2] in seen
+    # non-UUID ids (older clients, tests) are still tracked
+    assert seen.add("order-7") is False
+    assert "order-7" in seen
+    # hex ids from submit_order share the int form of the same 128 bits
+    u = uuid.uuid4()
+    assert seen.add(u.hex) is False
+    assert str(u) in seen
@@ -0,0 +1,35 @@
+from cafeds.proto import decode, encode, leader_alive, order_msg, with_hb_seq
+
+
+def test_leader_alive_binary_roundtrip():
+    cluster = [{"id": 3, "ip": "192.168.1.23", "tcp": 8003}]
+    hb = leader_alive(10, 4, 1234, 8010, cluster=cluster, hb_seq=77)
+    data = encode(hb)
+    assert not data.startswith(b"{")
+    assert decode(data) == hb
+
+
+def test_leader_alive_falls_back_to_json():
+    hb = leader_alive(10, 1, 0, 8010, cluster=[{"id": 3, "ip": "host-a", "tcp": 1}])
+    data = encode(hb)
+    assert data.startswith(b"{")
+    assert decode(data) == hb
+
+
+def test_other_messages_stay_json():
+    om = order_msg(10, 1, 5, "u-5", {"text": "Latte"})
+    assert decode(encode(om)) == om
+
+
+def test_decode_tolerates_invalid_utf8():
+    msg = decode(b'{"type":"WHO_IS_LEADER","name":"caf\xe9"}')
+    assert msg["type"] == "WHO_IS_LEADER"
+    assert msg["name"] == "caf�"
+
+
+def test_with_hb_seq_patches_binary_heartbeat():
+    cluster = [{"id": 3, "ip": "192.168.1.23", "tcp": 8003}]
+    data = encode(leader_alive(10, 4, 1234, 8010, cluster=cluster, hb_seq=1))
+    patched = with_hb_seq(data, 2)
+    assert decode(patched) == leader_alive(10, 4, 1234, 8010, cluster=cluster, hb_seq=2)
+    assert with_hb_seq(encode({"type": "LEADER_ALIVE"}), 2) is None
@@ -0,0 +1,29 @@
+import pytest
+
+from cafeds.seqlog import SeqLog
+
+
+def test_seqlog_behaves_like_seq_dict():
+    log = SeqLog()
+    assert log.max_seq == 0 and len(log) == 0
+    log[3] = {"seq": 3}
+    log[1] = {"seq": 1}
+    assert log.max_seq == 3
+    assert len(log) == 2
+    assert 2 not in log and 3 in log
+    assert log.get(2) is None and log[1] == {"seq": 1}
+    assert list(log.keys()) == [1, 3]
+    assert [m["seq"] for m in log.values()] == [1, 3]
+    assert [m["seq"] for m in log.range(2, 10)] == [3]
+    log[3] = {"seq": 3, "again": True}
+    assert len(log) == 2
+
+
+def test_seqlog_rejects_seq_far_beyond_the_end():
+    log = SeqLog()
+    log[1] = {"seq": 1}
+    with pytest.raises(KeyError):
+        log[10**9] = {"seq": 10**9}
+    with pytest.raises(KeyError):
+        log[0] = {"seq": 0}
+    assert log.max_seq == 1 and len(log) == 1
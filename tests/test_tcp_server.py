@@ -0,0 +1,75 @@
+import socket
+import threading
+import time
+
+from cafeds.proto import decode
+from cafeds import tcp_server
+from cafeds.tcp_server import TCPServer
+from cafeds.tcp_stream import FrameBuffer, send_frame
+
+
+def test_one_loop_serves_every_client():
+    got = []
+    arrived = threading.Event()
+
+    def on_msg(conn, msg):
+        got.append(msg["n"])
+        if len(got) == 6:
+            arrived.set()
+
+    server = TCPServer("127.0.0.1", 0, on_msg=on_msg, on_log=lambda _: None)
+    server.start()
+    port = server.sock.getsockname()[1]
+    clients = [socket.create_connection(("127.0.0.1", port)) for _ in range(3)]
+    try:
+        for i, c in enumerate(clients):
+            send_frame(c, {"n": 2 * i})
+            send_frame(c, {"n": 2 * i + 1})
+        assert arrived.wait(2.0)
+        assert sorted(got) == list(range(6))
+
+        for _ in range(50):  # accepts are registered asynchronously
+            if len(server.clients) == 3:
+                break
+            time.sleep(0.01)
+        server.broadcast({"type": "PING"})
+        for c in clients:
+            frames = FrameBuffer()
+            c.settimeout(2.0)
+            bodies = []
+            while not bodies:
+                assert frames.recv_from(c)
+                bodies = list(frames.frames())
+            assert [decode(b) for b in bodies] == [{"type": "PING"}]
+    finally:
+        for c in clients:
+            c.close()
+        server.stop()
+
+
+def test_slow_client_is_queued_then_dropped(monkeypatch):
+    monkeypatch.setattr(tcp_server, "MAX_PENDING_BYTES", 1 << 20)
+    server = TCPServer("127.0.0.1", 0, on_msg=lambda c, m: None, on_log=lambda _: None)
+    server.start()
+    port = server.sock.getsockname()[1]
+    slow = socket.create_connection(("127.0.0.1", port))  # never reads
+    try:
+        for _ in range(50):
+            if server.clients:
+                break
+            time.sleep(0.01)
+        conn = server.clients[0]
+        blob = {"text": "x" * 64 * 1024}
+        t0 = time.monotonic()
+        for _ in range(512):  # far more than the socket buffers hold
+            server.broadcast(blob)
+        assert time.monotonic() - t0 < 1.0  # queued, not blocked
+        for _ in range(100):
+            if not server.clients:
+                break
+            time.sleep(0.01)
+        assert server.clients == []
+        assert conn.pending_bytes <= tcp_server.MAX_PENDING_BYTES
+    finally:
+        slow.close()
+        server.stop()
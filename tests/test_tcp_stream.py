@@ -0,0 +1,27 @@
+import socket
+import threading
+
+from cafeds.proto import order_msg
+from cafeds.tcp_stream import read_frames, send_frame
+
+
+def test_frames_roundtrip_across_partial_reads():
+    a, b = socket.socketpair()
+    got = []
+    reader = threading.Thread(target=read_frames, args=(b, got.append))
+    reader.start()
+    try:
+        small = [order_msg(10, 1, i, f"u-{i}", {"text": "Çay"}) for i in range(50)]
+        # larger than the receive buffer: forces it to grow
+        big = order_msg(10, 1, 99, "u-big", {"text": "x" * 200_000})
+        for m in small:
+            send_frame(a, m)
+        send_frame(a, big)
+        # a frame split across two writes must still arrive whole
+        a.sendall(b"\x00\x00")
+        a.sendall(b"\x00\x02{}")
+    finally:
+        a.close()
+        reader.join(timeout=5)
+        b.close()
+    assert got == small + [big, {}]
@@ -0,0 +1,55 @@
+import socket
+import time
+
+from cafeds.udp_bus import RecentDatagrams, drain_udp, send_many
+
+
+def test_send_many_reaches_every_target():
+    receivers = []
+    for _ in range(3):
+        r = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        r.bind(("127.0.0.1", 0))
+        r.settimeout(2.0)
+        receivers.append(r)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        addrs = [r.getsockname() for r in receivers]
+        # twice: second call reuses the cached batch with a new payload
+        for payload in (b"hello", b"order\x00with-nul"):
+            assert send_many(sender, payload, addrs) == 0
+            for r in receivers:
+                assert r.recvfrom(1024)[0] == payload
+    finally:
+        sender.close()
+        for r in receivers:
+            r.close()
+
+
+def test_drain_udp_reads_until_queue_is_empty():
+    r = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    r.bind(("127.0.0.1", 0))
+    r.setblocking(False)
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for i in range(3):
+            s.sendto(b"m%d" % i, r.getsockname())
+        time.sleep(0.05)
+        assert [data for data, _ in drain_udp(r)] == [b"m0", b"m1", b"m2"]
+        assert list(drain_udp(r)) == []
+    finally:
+        s.close()
+        r.close()
+
+
+def test_recent_datagrams_expires_and_caps(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    dups = RecentDatagrams(window=1.0, max_entries=3)
+    assert dups.is_duplicate(1, b"a") is False
+    assert dups.is_duplicate(1, b"a") is True
+    assert dups.is_duplicate(2, b"a") is False  # other sender port
+    clock[0] += 1.5
+    assert dups.is_duplicate(1, b"a") is False  # window passed
+    for i in range(10):
+        dups.is_duplicate(1, b"%d" % i)
+    assert len(dups._seen) == 3
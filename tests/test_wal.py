@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from cafeds.wal import (
+    WalWriter,
+    encode_record,
+    iter_records,
+    open_for_replay,
+    valid_length,
+)
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "binary"])
+def test_wal_roundtrip(fmt):
+    orders = [
+        {"type": "ORDER", "seq": i, "order_uuid": f"u{i}", "payload": {"text": "Çay"}}
+        for i in range(1, 4)
+    ]
+    data = b"".join(encode_record(o, fmt) for o in orders)
+    assert list(iter_records(data, fmt)) == orders
+    assert valid_length(data, fmt) == len(data)
+
+
+def test_binary_wal_ignores_torn_tail():
+    first = encode_record({"seq": 1}, "binary")
+    second = encode_record({"seq": 2}, "binary")
+    data = first + second[:-3]
+    assert [o["seq"] for o in iter_records(data, "binary")] == [1]
+    assert valid_length(data, "binary") == len(first)
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_replay_from_file(tmp_path, use_mmap):
+    path = tmp_path / "wal.jsonl"
+    path.write_bytes(b"".join(encode_record({"seq": i}, "jsonl") for i in (1, 2)))
+    with open_for_replay(str(path), use_mmap) as data:
+        assert [o["seq"] for o in iter_records(data, "jsonl")] == [1, 2]
+
+    empty = tmp_path / "empty.jsonl"
+    empty.write_bytes(b"")
+    with open_for_replay(str(empty), use_mmap) as data:
+        assert list(iter_records(data, "jsonl")) == []
+
+
+@pytest.mark.parametrize("dsync", [False, True])
+def test_wal_writer_group_commit(tmp_path, dsync):
+    path = tmp_path / "wal.jsonl"
+    writer = WalWriter(str(path), sync_interval=0.001, dsync=dsync)
+    threads = [
+        threading.Thread(
+            target=writer.append, args=(encode_record({"seq": i}, "jsonl"),)
+        )
+        for i in range(1, 21)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.close()
+    seqs = sorted(o["seq"] for o in iter_records(path.read_bytes(), "jsonl"))
+    assert seqs == list(range(1, 21))
+    with pytest.raises(ValueError):
+        writer.append(b"{}\n")
+
+
+def test_wal_writer_survives_a_bad_record(tmp_path):
+    path = tmp_path / "wal.jsonl"
+    writer = WalWriter(str(path))
+    with pytest.raises(TypeError):
+        writer.append("not bytes")  # type: ignore[arg-type]
+    writer.append(encode_record({"seq": 1}, "jsonl"))
+    writer.close()
+    assert [o["seq"] for o in iter_records(path.read_bytes(), "jsonl")] == [1]